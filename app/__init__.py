@@ -2,14 +2,27 @@
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
+from flask_migrate import Migrate
 from config import Config
+from app.cache import Cache
+from app.tasks import TaskQueue
+from app.instrumentation import Instrumentation
+from app.assets import Assets
+from app.passwords import PasswordHasher
+from app.ratelimit import RateLimiter
+from app.database import RoutingSession, init_database
 
 # Initialize extensions
-db = SQLAlchemy()
-bcrypt = Bcrypt()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
+migrate = Migrate()
+cache = Cache()
+tasks = TaskQueue()
+metrics = Instrumentation()
+assets = Assets()
+passwords = PasswordHasher()
+limiter = RateLimiter()
 
 # Configure the login manager
 # 'main.login' is the function name of our login route
@@ -21,13 +34,27 @@ def create_app(config_class=Config):
     app.config.from_object(config_class)
 
     # Bind the extensions to the app instance
-    db.init_app(app)
-    bcrypt.init_app(app)
+    init_database(app, db)
+    migrate.init_app(app, db, render_as_batch=True)
     login_manager.init_app(app)
+    cache.init_app(app)
+    tasks.init_app(app)
+    metrics.init_app(app)
+    assets.init_app(app)
+    passwords.init_app(app)
 
     # Import and register the blueprint
     # Blueprints help organize routes, especially in larger apps
     from app.routes import main
     app.register_blueprint(main)
+    from app.api import api
+    app.register_blueprint(api)
+
+    # Registers the background job handlers
+    from app import ingest, recommendations, analytics
+
+    # Register the `flask ...` maintenance commands
+    from app.commands import register_commands
+    register_commands(app)
 
     return app
\ No newline at end of file
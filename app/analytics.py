@@ -0,0 +1,259 @@
+# app/analytics.py
+
+from datetime import date, datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from app import db, tasks
+from app.models import Item, Review, ItemDailyStats, CategoryDailyStats, RollupState
+
+# Category rows under this name hold the totals over every item
+ALL_CATEGORIES = '_all'
+STATE = 'daily'
+# Days rolled up per query; bounds the memory a long rebuild needs
+CHUNK_DAYS = 31
+STAT_COLUMNS = ('review_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+                'sentiment_sum', 'sentiment_count', 'reviewer_count')
+
+
+def _day_numbers(values):
+    # datetimes or dates -> days since 1970-01-01 (UTC, like date_posted)
+    return np.array(values, dtype='datetime64[D]').astype(np.int64)
+
+
+def _dates(day_numbers):
+    return np.asarray(day_numbers).astype('datetime64[D]').tolist()
+
+
+# --- Rollup ---
+def _aggregate(days, groups, users, ratings, sentiments):
+    """Stats per (day, group) for parallel arrays of reviews, without a Python loop per review.
+
+    Returns (days, groups, stats) with one row of STAT_COLUMNS per pair.
+    """
+    n_groups = int(groups.max()) + 1
+    keys, inverse = np.unique(days * n_groups + groups, return_inverse=True)
+    n = len(keys)
+    counts = np.bincount(inverse, minlength=n)
+    histogram = np.bincount(inverse * 5 + (np.clip(ratings, 1, 5) - 1), minlength=n * 5).reshape(n, 5)
+    scored = ~np.isnan(sentiments)
+    sentiment_sum = np.bincount(inverse, weights=np.where(scored, sentiments, 0.0), minlength=n)
+    sentiment_count = np.bincount(inverse[scored], minlength=n)
+    # Distinct (pair, user) combinations, counted per pair
+    n_users = int(users.max()) + 1
+    reviewers = np.bincount(np.unique(inverse * n_users + users) // n_users, minlength=n)
+    stats = np.column_stack([counts, histogram, sentiment_sum, sentiment_count, reviewers])
+    return keys // n_groups, keys % n_groups, stats
+
+
+def _rows(key_column, keys, days, stats):
+    counts = stats.astype(np.int64).tolist()
+    sentiment_sums = stats[:, STAT_COLUMNS.index('sentiment_sum')].tolist()
+    return [
+        {key_column: key, 'day': day, **dict(zip(STAT_COLUMNS, row)), 'sentiment_sum': sentiment_sum}
+        for key, day, row, sentiment_sum in zip(keys, _dates(days), counts, sentiment_sums)
+    ]
+
+
+def _roll_up_range(start, end, categories):
+    """Replace the stats rows for the days start <= day < end."""
+    reviews = db.session.execute(
+        select(Review.item_id, Review.user_id, Review.rating, Review.sentiment, Review.date_posted)
+        .where(Review.date_posted >= datetime.combine(start, datetime.min.time()),
+               Review.date_posted < datetime.combine(end, datetime.min.time()))
+    ).all()
+    db.session.execute(delete(ItemDailyStats).where(ItemDailyStats.day >= start, ItemDailyStats.day < end))
+    db.session.execute(delete(CategoryDailyStats).where(CategoryDailyStats.day >= start, CategoryDailyStats.day < end))
+    if reviews:
+        item_ids, user_ids, ratings, sentiments, posted = zip(*reviews)
+        item_ids = np.array(item_ids, dtype=np.int64)
+        users = np.array(user_ids, dtype=np.int64)
+        ratings = np.array(ratings, dtype=np.int64)
+        sentiments = np.array(sentiments, dtype=np.float64)  # None -> nan
+        days = _day_numbers(posted)
+        names, codes = categories
+        by_item = _aggregate(days, item_ids, users, ratings, sentiments)
+        by_category = _aggregate(days, codes[item_ids], users, ratings, sentiments)
+        overall = _aggregate(days, np.zeros_like(item_ids), users, ratings, sentiments)
+        db.session.execute(insert(ItemDailyStats), _rows('item_id', by_item[1].tolist(), by_item[0], by_item[2]))
+        db.session.execute(insert(CategoryDailyStats),
+                           _rows('category', [names[c] for c in by_category[1].tolist()], by_category[0], by_category[2])
+                           + _rows('category', [ALL_CATEGORIES] * len(overall[0]), overall[0], overall[2]))
+    return len(reviews)
+
+
+def _categories():
+    """(names, codes): codes[item_id] is the index of that item's category in names."""
+    items = db.session.execute(select(Item.id, Item.category)).all()
+    names = sorted({category for _, category in items})
+    codes = np.zeros(max((item_id for item_id, _ in items), default=0) + 1, dtype=np.int64)
+    index = {name: code for code, name in enumerate(names)}
+    for item_id, category in items:
+        codes[item_id] = index[category]
+    return names, codes
+
+
+def _ranges(days):
+    """Runs of consecutive dates as (start, end) pairs, at most CHUNK_DAYS long."""
+    ranges = []
+    for day in sorted(set(days)):
+        if ranges and ranges[-1][1] == day and (day - ranges[-1][0]).days < CHUNK_DAYS:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [tuple(r) for r in ranges]
+
+
+def roll_up_days(days):
+    """Recompute the item and category stats for the given dates. Returns reviews read."""
+    categories = _categories()
+    total = 0
+    for start, end in _ranges(days):
+        total += _roll_up_range(start, end, categories)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker rolled up the same days at the same moment
+            db.session.rollback()
+    return total
+
+
+def _new_review_days(after_id, up_to_id):
+    days = set()
+    new = (select(Review.date_posted).where(Review.id > after_id, Review.id <= up_to_id)
+           .execution_options(yield_per=50000))
+    for chunk in db.session.execute(new).scalars().partitions():
+        days.update(_dates(np.unique(_day_numbers(chunk))))
+    return days
+
+
+def _save_state(last_review_id, now):
+    state = db.session.get(RollupState, STATE)
+    if state is None:
+        db.session.add(RollupState(name=STATE, last_review_id=last_review_id, refreshed_at=now))
+    else:
+        state.last_review_id = last_review_id
+        state.refreshed_at = now
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+
+def refresh(now=None):
+    """Roll up the days that got reviews since the last run, plus the most recent days.
+
+    The recent days are always redone so sentiment scored after a review was
+    first counted shows up. Returns the dates that were rolled up.
+    """
+    now = now or datetime.utcnow()
+    state = db.session.get(RollupState, STATE)
+    last_id = state.last_review_id if state is not None else 0
+    # Read the high-water mark first; anything added meanwhile waits for the next run
+    max_id = db.session.scalar(select(func.max(Review.id))) or 0
+    days = _new_review_days(last_id, max_id)
+    today = now.date()
+    days.update(today - timedelta(days=n) for n in range(current_app.config['ANALYTICS_RECENT_DAYS']))
+    roll_up_days(days)
+    _save_state(max_id, now)
+    return sorted(days)
+
+
+def rebuild():
+    """Recompute every stats row from the full review history. Returns reviews read."""
+    now = datetime.utcnow()
+    max_id = db.session.scalar(select(func.max(Review.id))) or 0
+    first, last = db.session.execute(select(func.min(Review.date_posted), func.max(Review.date_posted))).one()
+    db.session.execute(delete(ItemDailyStats))
+    db.session.execute(delete(CategoryDailyStats))
+    db.session.commit()
+    total = 0
+    if first is not None:
+        day, last = first.date(), last.date()
+        total = roll_up_days(day + timedelta(days=n) for n in range((last - day).days + 1))
+    _save_state(max_id, now)
+    return total
+
+
+@tasks.handler('rollup')
+def roll_up_jobs(payloads):
+    """Redo the days that lost a review (new reviews are found by refresh)."""
+    roll_up_days({date.fromisoformat(payload['day']) for payload in payloads})
+
+
+def ensure_fresh():
+    """Refresh inline when the last run is older than ANALYTICS_MAX_STALENESS."""
+    state = db.session.get(RollupState, STATE)
+    max_staleness = timedelta(seconds=current_app.config['ANALYTICS_MAX_STALENESS'])
+    now = datetime.utcnow()
+    if state is None or now - state.refreshed_at > max_staleness:
+        # Use the time just written rather than reading the state back
+        refresh(now)
+        return now
+    return state.refreshed_at
+
+
+# --- Read Path ---
+def _ratio(numerator, denominator):
+    # Element-wise division with None wherever there's nothing to divide by
+    out = np.full(len(numerator), np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return [None if np.isnan(v) else round(float(v), 3) for v in out]
+
+
+def trend(start, end, item_id=None, category=None, bucket='day'):
+    """Time series over start <= day < end for an item, a category, or everything.
+
+    Reads at most one stats row per day, whatever the review volume. Days
+    without reviews are filled in as zeros; bucket='week' sums seven days
+    at a time (counting back from `end`), with reviewers as a daily average.
+    """
+    if item_id is not None:
+        model, match = ItemDailyStats, ItemDailyStats.item_id == item_id
+    else:
+        model, match = CategoryDailyStats, CategoryDailyStats.category == (category or ALL_CATEGORIES)
+    n_days = (end - start).days
+    step = 7 if bucket == 'week' else 1
+    n_days += -n_days % step
+    first = end - timedelta(days=n_days)
+    rows = db.session.execute(
+        select(model.day, *(getattr(model, column) for column in STAT_COLUMNS))
+        .where(match, model.day >= first, model.day < end)
+    ).all()
+    dense = np.zeros((n_days, len(STAT_COLUMNS)))
+    if rows:
+        days, *columns = zip(*rows)
+        dense[_day_numbers(days) - _day_numbers([first])[0]] = np.column_stack(columns)
+    dense = dense.reshape(-1, step, len(STAT_COLUMNS)).sum(axis=1)
+    counts = dense[:, 0]
+    histogram = dense[:, 1:6]
+    return {
+        'labels': [d.isoformat() for d in _dates(_day_numbers([first])[0] + np.arange(0, n_days, step))],
+        'reviews': counts.astype(int).tolist(),
+        'histogram': histogram.T.astype(int).tolist(),
+        'avg_rating': _ratio(histogram @ np.arange(1, 6), counts),
+        'avg_sentiment': _ratio(dense[:, 6], dense[:, 7]),
+        'reviewers': np.round(dense[:, 8] / step, 1).tolist(),
+    }
+
+
+def category_summary(start, end):
+    """Per-category totals over start <= day < end, largest first."""
+    sums = [func.sum(getattr(CategoryDailyStats, column)) for column in STAT_COLUMNS[:-1]]
+    rows = db.session.execute(
+        select(CategoryDailyStats.category, *sums)
+        .where(CategoryDailyStats.day >= start, CategoryDailyStats.day < end,
+               CategoryDailyStats.category != ALL_CATEGORIES)
+        .group_by(CategoryDailyStats.category)
+    ).all()
+    if not rows:
+        return []
+    names, *columns = zip(*rows)
+    totals = np.column_stack(columns).astype(float)
+    counts = totals[:, 0]
+    order = np.argsort(-counts, kind='stable')
+    avg_rating = _ratio(totals[:, 1:6] @ np.arange(1, 6), counts)
+    avg_sentiment = _ratio(totals[:, 6], totals[:, 7])
+    return [{'category': names[i], 'reviews': int(counts[i]),
+             'avg_rating': avg_rating[i], 'avg_sentiment': avg_sentiment[i]} for i in order]
@@ -0,0 +1,236 @@
+# app/api.py
+
+import hashlib
+import json
+from datetime import datetime
+from functools import wraps
+from flask import Blueprint, current_app, request
+from flask_login import current_user
+from sqlalchemy.orm import joinedload
+from werkzeug.exceptions import HTTPException, BadRequest, Forbidden, Unauthorized
+from app import cache, images, leaderboards, recommendations
+from app.database import read_replica
+from app.models import Item, Review
+from app.pagination import KeysetPage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+MAX_PER_PAGE = 100
+MAX_IDS = 100
+
+
+# --- Serialization ---
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), default=_default).encode()
+
+
+def _review_image(review):
+    if not review.image_file or review.image_pending:
+        return None
+    return images.image_url('uploads', review.image_file)
+
+
+# field name -> getter. `?fields=a,b` picks a subset; the default is all of them.
+ITEM_FIELDS = {
+    'id': lambda item: item.id,
+    'name': lambda item: item.name,
+    'category': lambda item: item.category,
+    'description': lambda item: item.description,
+    'image_url': lambda item: item.image_url,
+    'avg_rating': lambda item: item.avg_rating,
+    'review_count': lambda item: item.review_count,
+    'avg_sentiment': lambda item: item.avg_sentiment,
+}
+REVIEW_FIELDS = {
+    'id': lambda review: review.id,
+    'item_id': lambda review: review.item_id,
+    'user_id': lambda review: review.user_id,
+    'author': lambda review: review.author.username,
+    'rating': lambda review: review.rating,
+    'text': lambda review: review.text,
+    'sentiment': lambda review: review.sentiment,
+    'image_url': _review_image,
+    'date_posted': lambda review: review.date_posted,
+}
+
+
+def _fields(available):
+    requested = request.args.get('fields')
+    if not requested:
+        return list(available)
+    fields = [f for f in requested.split(',') if f]
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise BadRequest(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}.")
+    return fields
+
+
+def _serialize(obj, available, fields):
+    return {field: available[field](obj) for field in fields}
+
+
+def _ids():
+    raw = request.args.get('ids')
+    if raw is None:
+        return None
+    try:
+        ids = list(dict.fromkeys(int(i) for i in raw.split(',') if i))
+    except ValueError:
+        raise BadRequest('ids must be a comma-separated list of integers.')
+    if len(ids) > MAX_IDS:
+        raise BadRequest(f'At most {MAX_IDS} ids per request.')
+    return ids
+
+
+def _per_page(default=20):
+    return min(max(request.args.get('per_page', default, type=int), 1), MAX_PER_PAGE)
+
+
+def _page(page, data):
+    return {'data': data, 'next': page.next_cursor, 'prev': page.prev_cursor}
+
+
+# --- Conditional Responses ---
+def cached_json(namespaces, private=False):
+    """Serve the view's data as JSON with a weak ETag built from cache namespace versions.
+
+    `namespaces(**view_args)` lists the namespaces the response depends on.
+    Their versions come from the cache, so a matching If-None-Match is
+    answered with 304 before the database is touched; otherwise the
+    serialized body is itself cached under the same versions. Bodies are
+    shared by URL, so check access in a decorator above this one.
+
+    ETags are only sent with a shared (redis) cache backend. Per-process
+    versions never change in the workers that didn't see the write, so
+    their ETags would keep matching a stale copy forever.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            depends_on = namespaces(**kwargs)
+            etag = None
+            if cache.shared:
+                version = cache.version(*depends_on)
+                etag = hashlib.blake2b(f'{request.full_path}|{version}'.encode(), digest_size=12).hexdigest()
+            if etag is not None and request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                key = cache.key('api', *depends_on, path=request.full_path)
+                body = cache.get_or_set(key, lambda: dumps(view(*args, **kwargs)))
+                response = current_app.response_class(body, mimetype='application/json')
+            if etag is not None:
+                response.set_etag(etag, weak=True)
+            # Clients may keep the body but must check the ETag before reusing it
+            response.cache_control.no_cache = True
+            if private:
+                response.cache_control.private = True
+                response.vary.add('Cookie')
+            else:
+                response.cache_control.public = True
+            return response
+        return wrapper
+    return decorator
+
+
+def own_user_only(view):
+    # Before cached_json, which would otherwise hand out another user's cached body
+    @wraps(view)
+    def wrapper(user_id, **kwargs):
+        if not current_user.is_authenticated:
+            raise Unauthorized('Log in to see this resource.')
+        if user_id != current_user.id and not current_user.is_admin:
+            raise Forbidden('You can only see your own recommendations.')
+        return view(user_id=user_id, **kwargs)
+    return wrapper
+
+
+@api.errorhandler(HTTPException)
+def api_error(e):
+    return current_app.response_class(dumps({'error': e.name, 'message': e.description}),
+                                      status=e.code, mimetype='application/json')
+
+
+# --- Items ---
+def _items_namespaces():
+    ids = _ids()
+    if ids is not None:
+        return ['items', *(f'item:{item_id}' for item_id in ids)]
+    return ['items', 'reviews']
+
+
+@api.route('/items')
+@read_replica
+@cached_json(_items_namespaces)
+def items():
+    """Items with their rating aggregates: `?ids=1,2,3` for a batch, else keyset pages."""
+    fields = _fields(ITEM_FIELDS)
+    ids = _ids()
+    if ids is not None:
+        found = {item.id: item for item in Item.query.filter(Item.id.in_(ids))} if ids else {}
+        return {'data': [_serialize(found[i], ITEM_FIELDS, fields) for i in ids if i in found]}
+    query = Item.query
+    category = request.args.get('category')
+    if category:
+        query = query.filter(Item.category == category)
+    page = KeysetPage(query, [Item.name, Item.id], after=request.args.get('after'),
+                      before=request.args.get('before'), per_page=_per_page(), descending=False)
+    return _page(page, [_serialize(item, ITEM_FIELDS, fields) for item in page])
+
+
+@api.route('/items/<int:item_id>')
+@read_replica
+@cached_json(lambda item_id: [f'item:{item_id}'])
+def item(item_id):
+    return {'data': _serialize(Item.query.get_or_404(item_id), ITEM_FIELDS, _fields(ITEM_FIELDS))}
+
+
+@api.route('/items/<int:item_id>/reviews')
+@read_replica
+@cached_json(lambda item_id: [f'item:{item_id}'])
+def item_reviews(item_id):
+    """Newest first, in keyset pages (`?after=` / `?before=` with the returned cursors)."""
+    fields = _fields(REVIEW_FIELDS)
+    item = Item.query.get_or_404(item_id)
+    query = Review.query.filter_by(item_id=item.id)
+    if 'author' in fields:
+        query = query.options(joinedload(Review.author))
+    page = KeysetPage(query, [Review.date_posted, Review.id], after=request.args.get('after'),
+                      before=request.args.get('before'), per_page=_per_page())
+    return _page(page, [_serialize(review, REVIEW_FIELDS, fields) for review in page])
+
+
+# --- Leaderboards & Recommendations ---
+# Not @read_replica: like the homepage, this may recompute stale boards
+@api.route('/leaderboards')
+@cached_json(lambda: ['leaderboards', 'reviews', 'users'])
+def leaderboard():
+    top_items, trending, top_reviewers = leaderboards.homepage_boards()
+    return {'data': {
+        'top_rated': [{'id': item.id, 'name': item.name, 'avg_rating': item.avg_rating} for item in top_items],
+        'trending': [{'id': item.id, 'name': item.name, 'reviews': count} for item, count in trending],
+        'top_reviewers': [{'id': user.id, 'username': user.username, 'reviews': count}
+                          for user, count in top_reviewers],
+    }}
+
+
+@api.route('/users/<int:user_id>/recommendations')
+@read_replica
+@own_user_only
+@cached_json(lambda user_id: ['recommendations', 'reviews'], private=True)
+def user_recommendations(user_id):
+    fields = _fields(ITEM_FIELDS)
+    limit = current_app.config['RECOMMENDATIONS_PER_USER']
+    return {'data': [_serialize(item, ITEM_FIELDS, fields) for item in recommendations.for_user(user_id, limit)]}
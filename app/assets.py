@@ -0,0 +1,175 @@
+# app/assets.py
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from flask import current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+ONE_YEAR = 365 * 24 * 3600
+# Precompressed siblings written by `flask assets build`, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+# Uploads are already named by content (see app/images.py), so their URLs
+# are left alone; files named by an upload key are cached forever.
+UPLOAD_DIRS = ('uploads/', 'profile_pics/')
+UPLOAD_NAME = re.compile(r'^(?:uploads|profile_pics)/[0-9a-f]{16}[-.]')
+FINGERPRINTED = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{10})(?P<ext>\.\w+)$')
+
+
+def _is_fresh(path, compressed):
+    # A variant older than its source was built from a previous version of it
+    try:
+        return os.stat(compressed).st_mtime_ns >= os.stat(path).st_mtime_ns
+    except OSError:
+        return False
+
+
+# --- Assets Extension ---
+class Assets:
+    """Serves /static with fingerprinted URLs, far-future caching and precompression.
+
+    `url_for('static', filename='css/style.css')` gives
+    ``/static/css/style.<digest>.css``; the digest changes with the file's
+    content, so those URLs are marked immutable. Requests for them get the
+    .br or .gz sibling when the client accepts it, and conditional and Range
+    requests are answered as usual. With STATIC_SENDFILE set, the file itself
+    is left to the front proxy.
+    """
+
+    def __init__(self, app=None):
+        self.static_folder = None
+        self.sendfile = None
+        self.accel_prefix = '/_static/'
+        self._digests = {}  # filename -> (mtime_ns, size, digest)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.sendfile = app.config.get('STATIC_SENDFILE')
+        self.accel_prefix = app.config.get('STATIC_ACCEL_PREFIX', '/_static/')
+        if self.sendfile == 'x-sendfile':
+            app.config['USE_X_SENDFILE'] = True
+        app.extensions['assets'] = self
+        app.view_functions['static'] = self.serve
+        if app.config.get('STATIC_FINGERPRINT', True):
+            app.url_defaults(self._fingerprint_url)
+
+    # --- Fingerprinting ---
+    def digest(self, filename):
+        """Short content hash of a file under the static folder, or None if it's missing."""
+        path = safe_join(self.static_folder, filename)
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            return None
+        if stat is None:
+            return None
+        cached = self._digests.get(filename)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.file_digest(f, 'md5').hexdigest()[:10]
+        with self._lock:
+            self._digests[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _fingerprint_url(self, endpoint, values):
+        filename = values.get('filename')
+        if endpoint != 'static' or not filename or filename.startswith(UPLOAD_DIRS):
+            return
+        digest = self.digest(filename)
+        if digest is not None:
+            stem, ext = os.path.splitext(filename)
+            values['filename'] = f'{stem}.{digest}{ext}'
+
+    # --- Serving ---
+    def serve(self, filename):
+        path = safe_join(self.static_folder, filename)
+        match = FINGERPRINTED.match(filename)
+        if match and not (path and os.path.isfile(path)):
+            filename = match['stem'] + match['ext']
+            # An outdated digest still gets the file, just not cached forever
+            immutable = match['digest'] == self.digest(filename)
+        else:
+            immutable = UPLOAD_NAME.match(filename) is not None
+        return self.send(filename, immutable)
+
+    def send(self, filename, immutable=False):
+        path = safe_join(self.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        served, encoding, negotiated = filename, None, False
+        if filename.endswith(COMPRESSIBLE):
+            for name, suffix in ENCODINGS:
+                if not _is_fresh(path, path + suffix):
+                    continue
+                negotiated = True
+                # Byte ranges refer to the identity encoding clients asked about
+                if encoding is None and name in request.accept_encodings and 'Range' not in request.headers:
+                    served, encoding = filename + suffix, name
+
+        if self.sendfile == 'x-accel-redirect':
+            # nginx serves the file (with its own conditional and Range handling)
+            response = current_app.response_class(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = self.accel_prefix + served
+        else:
+            response = send_from_directory(self.static_folder, served, mimetype=mimetype, max_age=None)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if negotiated:
+            response.vary.add('Accept-Encoding')
+        if immutable:
+            # send_file marks responses without a max_age as no-cache
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = ONE_YEAR
+            response.cache_control.immutable = True
+        else:
+            # Revalidate every time; unchanged files get a 304 from the ETag
+            response.cache_control.no_cache = True
+        return response
+
+
+# --- Build Step ---
+def precompress(static_folder, level=9):
+    """Write .gz (and, with the optional `brotli` package, .br) next to every
+    compressible static file. Returns (filename, original size, {suffix: size})."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    results = []
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder)
+        if (rel_root + '/').startswith(UPLOAD_DIRS):
+            dirs[:] = []
+            continue
+        for name in sorted(files):
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            variants = {'.gz': gzip.compress(data, compresslevel=level, mtime=0)}
+            if brotli is not None:
+                variants['.br'] = brotli.compress(data, quality=11)
+            sizes = {}
+            for suffix, compressed in variants.items():
+                if len(compressed) >= len(data):
+                    # Not worth it; drop any stale variant so it isn't served
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+                    continue
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+                sizes[suffix] = len(compressed)
+            results.append((os.path.relpath(path, static_folder), len(data), sizes))
+    return results
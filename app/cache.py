@@ -0,0 +1,215 @@
+# app/cache.py
+
+import pickle
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from markupsafe import Markup
+
+
+# --- Backends ---
+class MemoryBackend:
+    # A per-process LRU with per-entry TTLs. Each gunicorn worker has its own,
+    # so an invalidation only reaches the worker that handled the write; use the
+    # redis backend when every worker must see it immediately.
+    shared = False
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] is not None and entry[1] <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    values.append(entry[0])
+        return values
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    # Shared by every worker; talks to any Redis-compatible server (Redis,
+    # Valkey, KeyDB, ...). Requires the optional `redis` package.
+    shared = True
+
+    def __init__(self, url, prefix='cc:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    @property
+    def evictions(self):
+        return self.client.info('stats').get('evicted_keys', 0)
+
+    def get_many(self, keys):
+        raw = self.client.mget([self.prefix + key for key in keys])
+        return [pickle.loads(value) if value is not None else None for value in raw]
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=timeout or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def size(self):
+        return self.client.dbsize()
+
+
+class NullBackend:
+    # Caches nothing; handy for tests and for measuring the uncached cost
+    evictions = 0
+    shared = False
+
+    def get_many(self, keys):
+        return [None] * len(keys)
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+    def size(self):
+        return 0
+
+
+# --- Cache Extension ---
+class Cache:
+    """Query-result and template-fragment cache with namespace invalidation.
+
+    Cached values are keyed on the current version of every namespace they
+    depend on (e.g. ``item:3`` or ``user:7``). A write calls ``invalidate``
+    for the namespaces it touched. That swaps in a fresh random version, so
+    the dependent keys are never read again and age out of the LRU.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.default_timeout = 300
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'memory')
+        if cache_type == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        elif cache_type == 'memory':
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 10000))
+        else:
+            self.backend = NullBackend()
+        self.default_timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+        app.extensions['cache'] = self
+        # Templates use {% call cache.fragment(...) %}
+        app.jinja_env.globals['cache'] = self
+
+    # --- Namespace versions ---
+    def _versions(self, namespaces):
+        version_keys = ['ver:' + ns for ns in namespaces]
+        versions = self.backend.get_many(version_keys)
+        for i, version in enumerate(versions):
+            if version is None:
+                # Unknown (or evicted) namespace: start from a fresh random
+                # version so no stale entry can ever match it.
+                versions[i] = secrets.token_hex(4)
+                self.backend.set(version_keys[i], versions[i])
+        return versions
+
+    def invalidate(self, *namespaces):
+        for ns in namespaces:
+            self.backend.set('ver:' + ns, secrets.token_hex(4))
+
+    @property
+    def shared(self):
+        """True when every worker sees the same namespace versions (the redis backend)."""
+        return self.backend.shared
+
+    def version(self, *namespaces):
+        """An opaque token that changes whenever any of the namespaces is invalidated."""
+        return ','.join(self._versions(namespaces))
+
+    def key(self, name, *namespaces, **parts):
+        """Build a cache key for `name` that changes whenever a namespace is invalidated."""
+        versioned = ','.join(f'{ns}@{v}' for ns, v in zip(namespaces, self._versions(namespaces)))
+        extra = ','.join(f'{k}={parts[k]}' for k in sorted(parts))
+        return f'{name}|{versioned}|{extra}'
+
+    # --- Get / Set ---
+    def get(self, key):
+        value = self.backend.get_many([key])[0]
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, timeout=None):
+        self.backend.set(key, value, timeout or self.default_timeout)
+
+    def get_or_set(self, key, producer, timeout=None):
+        value = self.get(key)
+        if value is None:
+            value = producer()
+            self.set(key, value, timeout)
+        return value
+
+    def fragment(self, name, *namespaces, timeout=None, caller=None, **parts):
+        """Jinja call-block helper: render the block once and reuse the HTML."""
+        key = self.key('fragment:' + name, *namespaces, **parts)
+        return Markup(self.get_or_set(key, lambda: str(caller()), timeout))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.backend.evictions,
+            'entries': self.backend.size(),
+        }
+
@@ -0,0 +1,238 @@
+# app/commands.py
+
+import time
+from datetime import datetime
+import click
+from sqlalchemy import or_
+from flask import current_app
+from flask.cli import AppGroup
+from app import db, leaderboards, tasks, sentiment, recommendations, search, queryplan, assets, transfer, analytics
+from app.assets import precompress
+from app.ingest import process_reviews
+from app.models import Review, rebuild_item_aggregates
+
+# --- Review Aggregates ---
+aggregates_cli = AppGroup('aggregates', help='Maintain the denormalized review aggregates.')
+
+@aggregates_cli.command('rebuild')
+def rebuild_aggregates():
+    """Recompute every item's rating and sentiment totals from the reviews table."""
+    updated = rebuild_item_aggregates()
+    click.echo(f'Rebuilt aggregates for {updated} reviewed items.')
+
+
+# --- Leaderboards ---
+leaderboards_cli = AppGroup('leaderboards', help='Maintain the precomputed homepage leaderboards.')
+
+@leaderboards_cli.command('refresh')
+@click.option('--loop', is_flag=True, help='Keep refreshing every LEADERBOARD_REFRESH_SECONDS.')
+def refresh_leaderboards(loop):
+    """Recompute the top-rated, trending and top-reviewer boards."""
+    while True:
+        computed_at = leaderboards.refresh()
+        click.echo(f'Leaderboards refreshed at {computed_at:%Y-%m-%d %H:%M:%S}.')
+        if not loop:
+            break
+        time.sleep(current_app.config['LEADERBOARD_REFRESH_SECONDS'])
+
+@leaderboards_cli.command('rebuild')
+def rebuild_leaderboards():
+    """Rebuild review buckets and reviewer counters from the full review history."""
+    buckets = leaderboards.rebuild()
+    click.echo(f'Rebuilt {buckets} review buckets and refreshed the leaderboards.')
+
+
+# --- Analytics ---
+analytics_cli = AppGroup('analytics', help='Maintain the daily rollups behind the admin trends page.')
+
+@analytics_cli.command('refresh')
+@click.option('--loop', is_flag=True, help='Keep refreshing every ANALYTICS_REFRESH_SECONDS.')
+def refresh_analytics(loop):
+    """Roll up the days that got new reviews, plus the last ANALYTICS_RECENT_DAYS days."""
+    while True:
+        days = analytics.refresh()
+        click.echo(f'Rolled up {len(days)} days at {datetime.utcnow():%Y-%m-%d %H:%M:%S}.')
+        if not loop:
+            break
+        time.sleep(current_app.config['ANALYTICS_REFRESH_SECONDS'])
+
+@analytics_cli.command('rebuild')
+def rebuild_analytics():
+    """Recompute every rollup from the full review history (e.g. after `flask sentiment rescore --all`)."""
+    started = time.perf_counter()
+    reviews = analytics.rebuild()
+    click.echo(f'Rolled up {reviews:,} reviews in {time.perf_counter() - started:.1f}s.')
+
+
+# --- Background Jobs ---
+tasks_cli = AppGroup('tasks', help='Inspect and recover the background job queue.')
+
+@tasks_cli.command('requeue')
+def requeue_reviews():
+    """Process every review still missing its sentiment or thumbnail (e.g. after a crash)."""
+    pending = db.session.query(Review.id).filter((Review.sentiment.is_(None)) | (Review.image_pending.is_(True)))
+    review_ids = [review_id for review_id, in pending]
+    if current_app.config['TASK_QUEUE_PATH']:
+        for review_id in review_ids:
+            tasks.enqueue('review', {'review_id': review_id})
+        click.echo(f'Queued {len(review_ids)} reviews on the durable queue.')
+        return
+    # An in-memory queue would vanish with this process, so do the work here
+    for start in range(0, len(review_ids), tasks.batch_size):
+        process_reviews([{'review_id': review_id} for review_id in review_ids[start:start + tasks.batch_size]])
+    click.echo(f'Processed {len(review_ids)} reviews.')
+
+# --- Sentiment ---
+sentiment_cli = AppGroup('sentiment', help='Score and re-score review sentiment.')
+
+@sentiment_cli.command('rescore')
+@click.option('--chunk-size', default=1000, show_default=True, help='Reviews scored and committed per chunk.')
+@click.option('--all', 'rescore_all', is_flag=True, help='Also re-score reviews already scored by the current analyzer.')
+@click.option('--after-id', default=0, help='Resume an interrupted run after this review id.')
+def rescore_sentiment(chunk_size, rescore_all, after_id):
+    """Stream reviews in id order and re-score them with the current analyzer.
+
+    Each chunk is committed on its own. Without --all, an interrupted run can
+    simply be started again, since finished rows already carry the current
+    analyzer version. With --all, pass the last reported id to --after-id.
+    """
+    stale = or_(Review.sentiment_version.is_(None), Review.sentiment_version != sentiment.ANALYZER_VERSION)
+    pending = db.session.query(Review.id, Review.item_id, Review.text, Review.sentiment).filter(Review.id > after_id)
+    if not rescore_all:
+        pending = pending.filter(stale)
+    total = pending.order_by(None).count()
+    click.echo(f'Re-scoring {total} reviews with {sentiment.ANALYZER_VERSION}.')
+    last_id, done, started = after_id, 0, time.perf_counter()
+    with click.progressbar(length=total, label='Scoring') as bar:
+        while True:
+            rows = pending.filter(Review.id > last_id).order_by(Review.id).limit(chunk_size).all()
+            if not rows:
+                break
+            done += sentiment.rescore_chunk(rows)
+            last_id = rows[-1].id
+            bar.update(len(rows))
+    elapsed = time.perf_counter() - started
+    click.echo(f'Scored {done} reviews in {elapsed:.1f}s ({done / elapsed if elapsed else 0:.0f}/s); last id {last_id}.')
+
+
+# --- Recommendations ---
+recommendations_cli = AppGroup('recommendations', help='Maintain the precomputed recommendations.')
+
+@recommendations_cli.command('rebuild')
+def rebuild_recommendations():
+    """Recompute the item similarity model and every user's top-K list."""
+    started = time.perf_counter()
+    users = recommendations.rebuild()
+    click.echo(f'Recommendations rebuilt for {users} users in {time.perf_counter() - started:.1f}s.')
+
+
+# --- Search ---
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+
+@search_cli.command('rebuild')
+def rebuild_search():
+    """Create the search index if needed and re-index all items and reviews."""
+    started = time.perf_counter()
+    search.rebuild()
+    click.echo(f'Search index rebuilt in {time.perf_counter() - started:.1f}s.')
+
+
+# --- Schema ---
+schema_cli = AppGroup('schema', help='Check the schema against the queries the pages run.')
+
+@schema_cli.command('check-plans')
+@click.option('--verbose', '-v', is_flag=True, help='Print every statement and its plan.')
+def check_plans(verbose):
+    """EXPLAIN QUERY PLAN every page's queries; fail if any does a full table scan."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.UsageError('check-plans reads SQLite query plans; point DATABASE_URL at a SQLite copy.')
+    try:
+        results = queryplan.check_pages()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    failures = 0
+    for label, status, statement, plan, scans in results:
+        if scans or verbose:
+            click.echo(f'{"FULL SCAN of " + ", ".join(scans) if scans else "ok"} in {label} (HTTP {status}):')
+            click.echo('    ' + ' '.join(statement.split()))
+            for line in plan:
+                click.echo(f'      {line}')
+        failures += bool(scans)
+    pages = len({label for label, *_ in results})
+    if failures:
+        raise click.ClickException(f'{failures} of {len(results)} statements across {pages} pages scan a whole table.')
+    click.echo(f'Checked {len(results)} statements across {pages} pages: no full table scans.')
+
+
+# --- Static Assets ---
+assets_cli = AppGroup('assets', help='Build the static asset files served to browsers.')
+
+@assets_cli.command('build')
+def build_assets():
+    """Write gzip (and brotli, if installed) copies of the CSS/JS files."""
+    results = precompress(current_app.static_folder)
+    for filename, size, variants in results:
+        compressed = ', '.join(f'{suffix} {n:,}' for suffix, n in variants.items()) or 'not compressible'
+        click.echo(f'{filename} ({assets.digest(filename)}): {size:,} bytes -> {compressed}')
+    if not any('.br' in variants for _, _, variants in results):
+        click.echo('No .br files written; `pip install brotli` to add them.')
+
+
+# --- Export / Import ---
+data_cli = AppGroup('data', help='Export and bulk-import menu items and reviews.')
+
+def _format(path, fmt):
+    return fmt or ('parquet' if path.endswith('.parquet') else 'csv')
+
+@data_cli.command('export')
+@click.argument('kind', type=click.Choice(list(transfer.EXPORTS)))
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(transfer.FORMATS), help='Defaults to the file extension.')
+def export_data(kind, path, fmt):
+    """Stream items, reviews or favorites to a CSV or Parquet file."""
+    started = time.perf_counter()
+    try:
+        count = transfer.export(kind, path, _format(path, fmt))
+    except ImportError:
+        raise click.ClickException('Parquet files need the optional pyarrow package (pip install pyarrow).')
+    elapsed = time.perf_counter() - started
+    click.echo(f'Exported {count:,} {kind} to {path} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s).')
+
+@data_cli.command('import')
+@click.argument('kind', type=click.Choice(['items', 'reviews']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(transfer.FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows scored and inserted per statement.')
+@click.option('--skip-derived', is_flag=True, help="Don't rebuild item aggregates and leaderboards after reviews.")
+def import_data(kind, path, fmt, batch_size, skip_derived):
+    """Load menu items (updating items with the same name) or historical reviews.
+
+    Item files need name and category columns, optionally description and
+    image_url. Review files need item_name, username, rating and text,
+    optionally date_posted and sentiment; the exports have these columns.
+    """
+    try:
+        rows = transfer.read_rows(path, _format(path, fmt))
+        if kind == 'items':
+            report = transfer.import_items(rows, batch_size)
+        else:
+            report = transfer.import_reviews(rows, batch_size, rebuild=not skip_derived)
+    except ImportError:
+        raise click.ClickException('Parquet files need the optional pyarrow package (pip install pyarrow).')
+    for number, reason in report.skipped:
+        click.echo(f'  skipped row {number}: {reason}')
+    click.echo(f'Imported {kind}: {report.inserted:,} inserted, {report.updated:,} updated, '
+               f'{report.skipped_count:,} skipped in {report.elapsed:.1f}s ({report.rows_per_second:,.0f} rows/s).')
+
+
+def register_commands(app):
+    app.cli.add_command(aggregates_cli)
+    app.cli.add_command(leaderboards_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(tasks_cli)
+    app.cli.add_command(sentiment_cli)
+    app.cli.add_command(recommendations_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(data_cli)
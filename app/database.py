@@ -0,0 +1,98 @@
+# app/database.py
+
+from functools import wraps
+from flask import g
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import Select
+
+REPLICA = 'replica'
+
+
+# --- Engine Options ---
+def _is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def engine_options(url, config):
+    """Engine keyword arguments for `url`, per backend."""
+    if _is_sqlite(url):
+        # Locking is handled by busy_timeout (see _sqlite_pragmas), not the pool
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        # Replace connections the server (or a proxy) may have silently dropped
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def _sqlite_pragmas(config):
+    # WAL lets readers carry on while a writer commits, and busy_timeout makes
+    # concurrent writers queue for the lock instead of failing with
+    # "database is locked". NORMAL is durable in WAL mode except on power loss.
+    pragmas = [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT_MS']}",
+        f"PRAGMA mmap_size={config['SQLITE_MMAP_SIZE']}",
+        # Negative values are KiB rather than pages
+        f"PRAGMA cache_size=-{config['SQLITE_CACHE_SIZE_KB']}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+
+def init_database(app, db):
+    """Configure engines for the app's database (and replica), then bind `db` to it."""
+    config = app.config
+    options = dict(engine_options(config['SQLALCHEMY_DATABASE_URI'], config))
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    replica_url = config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA] = {'url': replica_url, **engine_options(replica_url, config)}
+        config['SQLALCHEMY_BINDS'] = binds
+    db.init_app(app)
+
+    if config['SQLITE_TUNING']:
+        with app.app_context():
+            for engine in db.engines.values():
+                if engine.dialect.name == 'sqlite':
+                    event.listen(engine, 'connect', _sqlite_pragmas(config))
+
+
+# --- Read Replica Routing ---
+class RoutingSession(Session):
+    """Sends plain SELECTs to the 'replica' bind inside views marked @read_replica.
+
+    Writes, and any query issued while the session is flushing, always go to
+    the primary. Without a DATABASE_REPLICA_URL everything uses the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and g.get('read_replica') and not self._flushing
+                and isinstance(clause, Select) and REPLICA in self._db.engines):
+            return self._db.engines[REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """Route the view's reads to the replica. Only for views that never
+    write: the replica may lag, so a view that writes and then reads would
+    not see its own write."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_replica = True
+        return view(*args, **kwargs)
+    return wrapper
@@ -5,6 +5,7 @@ from flask_wtf.file import FileField, FileAllowed
 from wtforms import StringField, PasswordField, SubmitField, TextAreaField, SelectField
 from wtforms.validators import DataRequired, Length, EqualTo, ValidationError
 from app.models import User
+from app.passwords import MAX_PASSWORD_BYTES
 from flask_login import current_user
 
 class RegistrationForm(FlaskForm):
@@ -18,6 +19,10 @@ class RegistrationForm(FlaskForm):
         if user:
             raise ValidationError('That username is already taken. Please choose a different one.')
 
+    def validate_password(self, password):
+        if len(password.data.encode('utf-8')) > MAX_PASSWORD_BYTES:
+            raise ValidationError(f'Password must be at most {MAX_PASSWORD_BYTES} bytes long.')
+
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
     password = PasswordField('Password', validators=[DataRequired()])
@@ -0,0 +1,121 @@
+# app/images.py
+
+import hashlib
+import io
+import os
+from PIL import Image, ImageOps
+from flask import url_for
+
+# Widths (in px) each upload is scaled to, keeping its aspect ratio; srcset
+# advertises them as such. Every size is written as WebP plus a JPEG
+# fallback, named <content hash>-<size>.<ext>.
+SIZES = {
+    'uploads': (150, 320, 640),
+    'profile_pics': (150, 320),
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+ORIENTATION = 0x0112  # EXIF tag
+
+
+def content_key(data):
+    # 16 hex chars: short enough for User.image_file, long enough not to collide
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def variant_name(key, size, ext):
+    return f'{key}-{size}.{ext}'
+
+
+def is_processed(name):
+    # Files saved before this pipeline existed (and 'default.jpg') keep their extension
+    return name is not None and '.' not in name
+
+
+# --- Processing ---
+def _save_atomic(image, path, ext):
+    image_format, options = FORMATS[ext]
+    # Another worker may be writing the same content; each writes its own temp file
+    tmp = f'{path}.{os.getpid()}.tmp'
+    image.save(tmp, image_format, **options)
+    os.replace(tmp, path)
+
+
+def process_image(data, dst_dir, sizes, max_pixels):
+    """Write every size of the image in `data` (bytes) to `dst_dir`; returns its key.
+
+    Identical uploads get the same key, so a re-upload is a no-op. Raises
+    Image.DecompressionBombError for images over `max_pixels` and OSError
+    for anything Pillow can't read.
+    """
+    key = content_key(data)
+    paths = {(size, ext): os.path.join(dst_dir, variant_name(key, size, ext))
+             for size in sizes for ext in FORMATS}
+    if all(os.path.exists(path) for path in paths.values()):
+        return key
+
+    image = Image.open(io.BytesIO(data))
+    # Only the header has been read so far; refuse to decode a bomb
+    if image.width * image.height > max_pixels:
+        raise Image.DecompressionBombError(f'{image.width}x{image.height} exceeds {max_pixels} pixels')
+    largest = max(sizes)
+    # For JPEGs, let libjpeg decode at 1/2, 1/4 or 1/8 scale, keeping the
+    # width (the height, for photos the EXIF orientation turns sideways) >= largest
+    rotated = image.getexif().get(ORIENTATION) in (5, 6, 7, 8)
+    image.draft('RGB', (1, largest) if rotated else (largest, 1))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    os.makedirs(dst_dir, exist_ok=True)
+    # Largest first, each size scaled down from the one before. Only the
+    # width is bounded, so portrait photos are `size` px wide, not narrower.
+    for size in sorted(sizes, reverse=True):
+        image.thumbnail((size, image.height), Image.LANCZOS)
+        # Pillow only writes EXIF when given it, so the variants carry none
+        _save_atomic(image, paths[(size, 'webp')], 'webp')
+        _save_atomic(image.convert('RGB'), paths[(size, 'jpg')], 'jpg')
+    return key
+
+
+# Returned by process_upload when the staged file isn't there (never a valid key)
+MISSING = 'missing'
+
+
+# Module-level so it can be pickled over to the task pool's processes
+def process_upload(args):
+    """Process a staged upload file; returns the key, None if the image is
+    unreadable, or MISSING if the file is gone.
+
+    The file is left in place: the caller removes it once the result has
+    been committed, so a retried job can process it again.
+    """
+    src, dst_dir, sizes, max_pixels = args
+    try:
+        with open(src, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return MISSING
+    try:
+        return process_image(data, dst_dir, sizes, max_pixels)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Unreadable upload: drop it rather than retrying forever
+        return None
+
+
+# --- Template Helpers ---
+def srcset(folder, key, ext):
+    """`srcset` attribute value listing every size of `key` in `folder`."""
+    return ', '.join(f"{url_for('static', filename=f'{folder}/{variant_name(key, size, ext)}')} {size}w"
+                     for size in SIZES[folder])
+
+
+def image_url(folder, name, size=None):
+    """URL of one JPEG variant (the largest by default), or of a legacy file."""
+    if not is_processed(name):
+        return url_for('static', filename=f'{folder}/{name}')
+    return url_for('static', filename=f'{folder}/{variant_name(name, size or max(SIZES[folder]), "jpg")}')
@@ -0,0 +1,63 @@
+# app/ingest.py
+
+import logging
+import os
+from flask import current_app
+from sqlalchemy import update
+from app import db, cache, tasks, metrics, sentiment, images
+from app.models import Item, Review
+
+log = logging.getLogger(__name__)
+
+
+def upload_dirs():
+    uploads = os.path.join(current_app.root_path, 'static/uploads')
+    return uploads, os.path.join(uploads, 'pending')
+
+
+# --- Review Ingestion ---
+@tasks.handler('review')
+def process_reviews(payloads):
+    """Fill in sentiment and image sizes for freshly posted reviews."""
+    review_ids = [payload['review_id'] for payload in payloads]
+    reviews = (db.session.query(Review.id, Review.item_id, Review.user_id, Review.text,
+                                Review.sentiment, Review.image_file, Review.image_pending)
+               .filter(Review.id.in_(review_ids)).all())
+    uploads, pending = upload_dirs()
+
+    to_score = [r for r in reviews if r.sentiment is None]
+    scores = sentiment.analyze_batch([r.text for r in to_score])
+    to_resize = [r for r in reviews if r.image_pending]
+    max_pixels = current_app.config['MAX_IMAGE_PIXELS']
+    staged = [os.path.join(pending, r.image_file) for r in to_resize]
+    with metrics.timer('pillow'):
+        keys = tasks.map(images.process_upload, [(path, uploads, images.SIZES['uploads'], max_pixels)
+                                                 for path in staged])
+
+    # Guarded UPDATEs: a review deleted (or already scored) since it was read
+    # simply matches no row, and its item's totals are left alone.
+    for review, score in zip(to_score, scores):
+        scored = db.session.execute(
+            update(Review).where(Review.id == review.id, Review.sentiment.is_(None))
+            .values(sentiment=score, sentiment_version=sentiment.ANALYZER_VERSION)
+            .execution_options(synchronize_session=False))
+        if scored.rowcount:
+            db.session.execute(
+                update(Item).where(Item.id == review.item_id)
+                .values(sentiment_sum=Item.sentiment_sum + score, sentiment_count=Item.sentiment_count + 1)
+                .execution_options(synchronize_session=False))
+    for review, key in zip(to_resize, keys):
+        if key == images.MISSING:
+            # Gone without being recorded; leave the review as it is rather than drop its image
+            log.warning('Staged upload %s for review %s is missing', review.image_file, review.id)
+            continue
+        db.session.execute(
+            update(Review).where(Review.id == review.id, Review.image_pending.is_(True))
+            .values(image_pending=False, image_file=key)
+            .execution_options(synchronize_session=False))
+    db.session.commit()
+    # Only now: if the commit had failed, the retried job would need the staged files
+    for path, key in zip(staged, keys):
+        if key != images.MISSING and os.path.exists(path):
+            os.remove(path)
+    cache.invalidate(*{f'item:{r.item_id}' for r in reviews}, *{f'user:{r.user_id}' for r in reviews}, 'reviews')
@@ -0,0 +1,225 @@
+# app/instrumentation.py
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from flask import Response, g, has_request_context, request, request_started, request_finished
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+# --- Metric Registry ---
+class Registry:
+    # Counters and histograms keyed by a tuple of label values, rendered in
+    # the Prometheus text format. Values are per process, like the cache.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}  # name -> (type, help, label names, buckets)
+        self._values = {}  # name -> {labels: value or [bucket counts, sum, count]}
+
+    def counter(self, name, help, labels=()):
+        self._meta[name] = ('counter', help, labels, None)
+        self._values[name] = {}
+
+    def histogram(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        self._meta[name] = ('histogram', help, labels, buckets)
+        self._values[name] = {}
+
+    def inc(self, name, amount=1, *labels):
+        with self._lock:
+            values = self._values[name]
+            values[labels] = values.get(labels, 0) + amount
+
+    def observe(self, name, value, *labels):
+        buckets = self._meta[name][3]
+        with self._lock:
+            entry = self._values[name].setdefault(labels, [[0] * len(buckets), 0.0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (kind, help, label_names, buckets) in self._meta.items():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in sorted(self._values[name].items()):
+                    pairs = [f'{k}="{_escape(v)}"' for k, v in zip(label_names, labels)]
+                    if kind == 'counter':
+                        lines.append(f'{name}{_labels(pairs)} {value}')
+                        continue
+                    counts, total, count = value
+                    for bound, bucket_count in zip(buckets, counts):
+                        lines.append(f'{name}_bucket{_labels(pairs + [_le(bound)])} {bucket_count}')
+                    lines.append(f'{name}_bucket{_labels(pairs + [_le("+Inf")])} {count}')
+                    lines.append(f'{name}_sum{_labels(pairs)} {total}')
+                    lines.append(f'{name}_count{_labels(pairs)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _le(bound):
+    return f'le="{bound}"'
+
+
+def _labels(pairs):
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+# --- Per-request State ---
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_started = None
+        self.statements = Counter()
+        self.spans = Counter()
+
+
+# --- Instrumentation Extension ---
+class Instrumentation:
+    """Per-request SQL, template and library timings, exported as Prometheus metrics.
+
+    Every statement sent through the engine during a request is counted and
+    timed; slow ones are sampled, and a statement repeated N_PLUS_ONE_THRESHOLD
+    or more times in one request is flagged as a likely N+1. `timer(span)`
+    wraps other expensive calls (TextBlob, Pillow) so they show up too.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.server_timing = False
+        self.slow_query_seconds = 0.1
+        self.n_plus_one_threshold = 5
+        self.slow_queries = deque(maxlen=50)
+        self.n_plus_one = deque(maxlen=50)
+        self.registry = Registry()
+        self.registry.counter('app_http_requests_total', 'Requests handled.', ('endpoint', 'method', 'status'))
+        self.registry.histogram('app_http_request_duration_seconds', 'Request latency.', ('endpoint',))
+        self.registry.histogram('app_db_queries_per_request', 'SQL statements per request.', ('endpoint',),
+                                buckets=QUERY_COUNT_BUCKETS)
+        self.registry.counter('app_db_query_seconds_total', 'Time spent in SQL statements.', ('endpoint',))
+        self.registry.counter('app_template_render_seconds_total', 'Time spent rendering templates.', ('endpoint',))
+        self.registry.counter('app_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.', ('endpoint',))
+        self.registry.counter('app_n_plus_one_total', 'Statements repeated per request past the N+1 threshold.',
+                              ('endpoint',))
+        self.registry.counter('app_span_seconds_total', 'Time spent in timed library calls.', ('span',))
+        self.registry.counter('app_span_calls_total', 'Timed library calls.', ('span',))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('INSTRUMENTATION_ENABLED', True)
+        self.server_timing = app.config.get('SERVER_TIMING_HEADER', False)
+        self.slow_query_seconds = app.config.get('SLOW_QUERY_MS', 100) / 1000
+        self.n_plus_one_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 5)
+        app.extensions['instrumentation'] = self
+        if not self.enabled:
+            return
+        request_started.connect(self._request_started, app)
+        request_finished.connect(self._request_finished, app)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+        # The engines only exist once Flask-SQLAlchemy has been set up on the app.
+        # Every bind is hooked, so pages reading from the replica are counted too.
+        with app.app_context():
+            for engine in app.extensions['sqlalchemy'].engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _stats(self):
+        return g.get('_request_stats') if has_request_context() else None
+
+    # --- SQLAlchemy events ---
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        stats = self._stats()
+        if stats is None:
+            return
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        stats.statements[statement] += 1
+        if elapsed >= self.slow_query_seconds:
+            endpoint = request.endpoint or 'unknown'
+            self.registry.inc('app_slow_queries_total', 1, endpoint)
+            self.slow_queries.append({'endpoint': endpoint, 'ms': round(elapsed * 1000, 2), 'statement': statement})
+            log.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, endpoint, statement)
+
+    # --- Flask signals ---
+    def _request_started(self, sender, **extra):
+        g._request_stats = RequestStats()
+
+    def _render_started(self, sender, template, context, **extra):
+        stats = self._stats()
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+
+    def _render_finished(self, sender, template, context, **extra):
+        stats = self._stats()
+        if stats is not None and stats.render_started is not None:
+            stats.render_seconds += time.perf_counter() - stats.render_started
+            stats.render_started = None
+
+    def _request_finished(self, sender, response, **extra):
+        stats = self._stats()
+        if stats is None:
+            return
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unknown'
+        self.registry.inc('app_http_requests_total', 1, endpoint, request.method, str(response.status_code))
+        self.registry.observe('app_http_request_duration_seconds', elapsed, endpoint)
+        self.registry.observe('app_db_queries_per_request', stats.queries, endpoint)
+        self.registry.inc('app_db_query_seconds_total', stats.db_seconds, endpoint)
+        self.registry.inc('app_template_render_seconds_total', stats.render_seconds, endpoint)
+        for statement, count in stats.statements.items():
+            if count >= self.n_plus_one_threshold:
+                self.registry.inc('app_n_plus_one_total', 1, endpoint)
+                self.n_plus_one.append({'endpoint': endpoint, 'count': count, 'statement': statement})
+                log.warning('Possible N+1 in %s: statement ran %d times: %s', endpoint, count, statement)
+        if self.server_timing:
+            timings = [f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"',
+                       f'render;dur={stats.render_seconds * 1000:.1f}']
+            timings += [f'{span};dur={seconds * 1000:.1f}' for span, seconds in stats.spans.items()]
+            timings.append(f'total;dur={elapsed * 1000:.1f}')
+            response.headers['Server-Timing'] = ', '.join(timings)
+
+    # --- Timed spans ---
+    @contextmanager
+    def timer(self, span):
+        """Time a block, both per request (Server-Timing) and in the span metrics."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.registry.inc('app_span_seconds_total', elapsed, span)
+            self.registry.inc('app_span_calls_total', 1, span)
+            stats = self._stats()
+            if stats is not None:
+                stats.spans[span] += elapsed
+
+    # --- Export ---
+    def _metrics_view(self):
+        return Response(self.registry.render(), mimetype='text/plain; version=0.0.4')
+
+    def samples(self):
+        return {'slow_queries': list(self.slow_queries), 'n_plus_one': list(self.n_plus_one)}
@@ -0,0 +1,192 @@
+# app/leaderboards.py
+
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+from app import db, cache
+from app.models import User, Item, Review, ReviewBucket, LeaderboardEntry, upsert_insert
+
+TOP_RATED = 'top_rated'
+TRENDING = 'trending'
+TOP_REVIEWERS = 'top_reviewers'
+# Written on every refresh so an empty board still records when it was computed
+REFRESH_MARKER = '_refreshed'
+
+TRENDING_WINDOW = timedelta(days=7)
+# Hourly buckets are only needed for the partial day at the start of the
+# trending window, so anything older than this is pruned on refresh.
+HOUR_BUCKET_RETENTION = TRENDING_WINDOW + timedelta(days=1)
+
+
+def _bucket_starts(when):
+    hour = when.replace(minute=0, second=0, microsecond=0)
+    return (('hour', hour), ('day', hour.replace(hour=0)))
+
+
+# --- Write Path ---
+def _increment_bucket(item_id, granularity, bucket_start, delta):
+    values = dict(item_id=item_id, granularity=granularity, bucket_start=bucket_start, review_count=delta)
+    stmt = upsert_insert(ReviewBucket)
+    if stmt is not None:
+        stmt = stmt.values(**values).on_conflict_do_update(
+            index_elements=['item_id', 'granularity', 'bucket_start'],
+            set_={'review_count': ReviewBucket.review_count + delta},
+        )
+        db.session.execute(stmt)
+        return
+    bucket = db.session.get(ReviewBucket, (item_id, granularity, bucket_start))
+    if bucket is None:
+        db.session.add(ReviewBucket(**values))
+    else:
+        bucket.review_count = ReviewBucket.review_count + delta
+
+
+def record_review(review):
+    """Count a newly posted review towards the trending buckets and its author's total."""
+    if review.date_posted is None:
+        # Stamp it now so the row and its buckets agree on the posting time
+        review.date_posted = datetime.utcnow()
+    for granularity, bucket_start in _bucket_starts(review.date_posted):
+        _increment_bucket(review.item_id or review.item.id, granularity, bucket_start, 1)
+    author = review.author
+    author.review_count = User.review_count + 1
+
+
+def discard_review(review):
+    """Undo record_review for a review that is about to be deleted."""
+    for granularity, bucket_start in _bucket_starts(review.date_posted):
+        # A plain UPDATE, so deleting an old review never recreates a pruned bucket
+        db.session.execute(
+            update(ReviewBucket)
+            .where(ReviewBucket.item_id == review.item_id,
+                   ReviewBucket.granularity == granularity,
+                   ReviewBucket.bucket_start == bucket_start)
+            .values(review_count=ReviewBucket.review_count - 1)
+        )
+    review.author.review_count = User.review_count - 1
+
+
+# --- Board Computation ---
+def _trending_counts(now):
+    window_start = now - TRENDING_WINDOW
+    first_full_day = window_start.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    first_hour = window_start.replace(minute=0, second=0, microsecond=0)
+    # Hourly buckets cover the partial day at the start of the window,
+    # daily buckets cover everything from the next midnight onwards.
+    hourly = (db.session.query(ReviewBucket.item_id, func.sum(ReviewBucket.review_count))
+              .filter(ReviewBucket.granularity == 'hour',
+                      ReviewBucket.bucket_start >= first_hour,
+                      ReviewBucket.bucket_start < first_full_day)
+              .group_by(ReviewBucket.item_id))
+    daily = (db.session.query(ReviewBucket.item_id, func.sum(ReviewBucket.review_count))
+             .filter(ReviewBucket.granularity == 'day',
+                     ReviewBucket.bucket_start >= first_full_day)
+             .group_by(ReviewBucket.item_id))
+    counts = Counter()
+    for item_id, count in list(hourly) + list(daily):
+        counts[item_id] += count
+    return counts
+
+
+def _compute_boards(now, size):
+    average = Item.rating_sum * 1.0 / Item.rating_count
+    top_rated = (db.session.query(Item.id, average)
+                 .filter(Item.rating_count > 0)
+                 .order_by(average.desc(), Item.id)
+                 .limit(size).all())
+    trending = sorted(((item_id, count) for item_id, count in _trending_counts(now).items() if count > 0),
+                      key=lambda pair: (-pair[1], pair[0]))[:size]
+    top_reviewers = (db.session.query(User.id, User.review_count)
+                     .filter(User.review_count > 0)
+                     .order_by(User.review_count.desc(), User.id)
+                     .limit(size).all())
+    return {TOP_RATED: top_rated, TRENDING: trending, TOP_REVIEWERS: top_reviewers}
+
+
+def _refresh(now):
+    # Returns the entries it wrote, in the order _load_boards reads them
+    size = current_app.config['LEADERBOARD_SIZE']
+    boards = _compute_boards(now, size)
+    rows = [{'board': REFRESH_MARKER, 'rank': 0, 'subject_id': 0, 'score': 0, 'computed_at': now}]
+    rows += [
+        {'board': board, 'rank': rank, 'subject_id': subject_id, 'score': score, 'computed_at': now}
+        for board, ranked in boards.items()
+        for rank, (subject_id, score) in enumerate(ranked, start=1)
+    ]
+    rows.sort(key=lambda row: (row['board'], row['rank']))
+    LeaderboardEntry.query.delete()
+    db.session.execute(insert(LeaderboardEntry), rows)
+    ReviewBucket.query.filter(ReviewBucket.granularity == 'hour',
+                              ReviewBucket.bucket_start < now - HOUR_BUCKET_RETENTION).delete()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker refreshed at the same moment; its result is just as fresh
+        db.session.rollback()
+    cache.invalidate('leaderboards')
+    # Detached copies, so the caller needn't read back what was just written
+    return [LeaderboardEntry(**row) for row in rows]
+
+
+def refresh(now=None):
+    """Recompute every board and prune hourly buckets that fell out of the window."""
+    now = now or datetime.utcnow()
+    _refresh(now)
+    return now
+
+
+def rebuild():
+    """Rebuild the review buckets and per-user counters from the full review history."""
+    hour_cutoff = datetime.utcnow() - HOUR_BUCKET_RETENTION
+    buckets = Counter()
+    for item_id, posted in db.session.query(Review.item_id, Review.date_posted).yield_per(10000):
+        for granularity, bucket_start in _bucket_starts(posted):
+            if granularity == 'hour' and bucket_start < hour_cutoff:
+                continue
+            buckets[(item_id, granularity, bucket_start)] += 1
+    ReviewBucket.query.delete()
+    if buckets:
+        db.session.execute(insert(ReviewBucket), [
+            {'item_id': item_id, 'granularity': granularity, 'bucket_start': bucket_start, 'review_count': count}
+            for (item_id, granularity, bucket_start), count in buckets.items()
+        ])
+    counts = db.session.query(Review.user_id, func.count(Review.id)).group_by(Review.user_id).all()
+    db.session.execute(update(User).values(review_count=0))
+    if counts:
+        db.session.execute(update(User), [{'id': user_id, 'review_count': count} for user_id, count in counts])
+    db.session.commit()
+    refresh()
+    return len(buckets)
+
+
+# --- Read Path ---
+def _load_boards():
+    entries = LeaderboardEntry.query.order_by(LeaderboardEntry.board, LeaderboardEntry.rank).all()
+    computed_at = min((entry.computed_at for entry in entries), default=None)
+    max_staleness = timedelta(seconds=current_app.config['LEADERBOARD_MAX_STALENESS'])
+    if computed_at is None or datetime.utcnow() - computed_at > max_staleness:
+        entries = _refresh(datetime.utcnow())
+    return entries
+
+
+def homepage_boards():
+    """Return (top_items, trending, top_reviewers) for the homepage from the stored boards.
+
+    trending and top_reviewers are lists of (object, review_count) pairs.
+    """
+    entries = _load_boards()
+    item_ids = {e.subject_id for e in entries if e.board in (TOP_RATED, TRENDING)}
+    user_ids = {e.subject_id for e in entries if e.board == TOP_REVIEWERS}
+    items = {i.id: i for i in Item.query.filter(Item.id.in_(item_ids))} if item_ids else {}
+    users = {u.id: u for u in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+    top_items, trending, top_reviewers = [], [], []
+    for entry in entries:
+        if entry.board == TOP_RATED and entry.subject_id in items:
+            top_items.append(items[entry.subject_id])
+        elif entry.board == TRENDING and entry.subject_id in items:
+            trending.append((items[entry.subject_id], int(entry.score)))
+        elif entry.board == TOP_REVIEWERS and entry.subject_id in users:
+            top_reviewers.append((users[entry.subject_id], int(entry.score)))
+    return top_items, trending, top_reviewers
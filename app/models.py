@@ -1,21 +1,90 @@
 # app/models.py
 
 from datetime import datetime
-from app import db, login_manager
+from app import db, login_manager, cache
+from app.cache import MemoryBackend
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import make_transient_to_detached
 
 # ... (favorites association table remains the same) ...
 favorites = db.Table('favorites',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('item_id', db.Integer, db.ForeignKey('item.id'), primary_key=True)
+    db.Column('item_id', db.Integer, db.ForeignKey('item.id'), primary_key=True),
+    # The primary key serves "a user's favorites"; this serves "who favorited an item"
+    db.Index('ix_favorites_item_user', 'item_id', 'user_id'),
 )
 
+def upsert_insert(table):
+    """An INSERT that supports .on_conflict_do_nothing() / .on_conflict_do_update(),
+    or None on a database without ON CONFLICT (the caller falls back to a SELECT)."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(table)
+
+
+def add_favorite(user_id, item_id):
+    """Favorite an item in one statement; returns False if it already was."""
+    stmt = upsert_insert(favorites)
+    if stmt is not None:
+        stmt = stmt.values(user_id=user_id, item_id=item_id).on_conflict_do_nothing()
+        return db.session.execute(stmt).rowcount > 0
+    exists = db.session.execute(select(favorites.c.item_id).where(
+        favorites.c.user_id == user_id, favorites.c.item_id == item_id)).first()
+    if exists:
+        return False
+    db.session.execute(insert(favorites).values(user_id=user_id, item_id=item_id))
+    return True
+
+
+def remove_favorite(user_id, item_id):
+    """Unfavorite an item in one statement; returns False if it wasn't a favorite."""
+    stmt = delete(favorites).where(favorites.c.user_id == user_id, favorites.c.item_id == item_id)
+    return db.session.execute(stmt).rowcount > 0
+
+
+# --- Logged-in User Cache ---
+# load_user runs on every request from a logged-in user. Its column values and
+# favorite ids are kept per process for USER_CACHE_TTL seconds, stamped with
+# the 'user:<id>' cache version: a profile edit or favorite toggle invalidates
+# that namespace, so the next request reloads the user. The version lives in
+# the app cache, so other workers only see the change at once with the redis
+# backend; with the memory backend they may serve the old snapshot until the
+# TTL runs out.
+_user_snapshots = MemoryBackend(max_entries=10000)
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    version = cache.version(f'user:{user_id}')
+    cached = _user_snapshots.get_many([user_id])[0]
+    if cached is not None and cached[0] == version:
+        _, columns, favorite_ids = cached
+        # Attach without a SELECT; it behaves like a loaded row from here on
+        user = User(**columns)
+        make_transient_to_detached(user)
+        user = db.session.merge(user, load=False)
+        user._favorite_ids = favorite_ids
+        return user
+    user = db.session.get(User, user_id)
+    if user is not None:
+        columns = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        _user_snapshots.set(user_id, (version, columns, user.favorite_ids),
+                            timeout=current_app.config['USER_CACHE_TTL'])
+    return user
 
 class User(db.Model, UserMixin):
-    # ... (no changes to the User model) ...
+    # The top-reviewers board reads users by review_count
+    __table_args__ = (
+        db.Index('ix_user_review_count', 'review_count', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(20), unique=True, nullable=False)
     password = db.Column(db.String(60), nullable=False)
@@ -23,10 +92,24 @@ class User(db.Model, UserMixin):
     # Add new profile fields
     image_file = db.Column(db.String(20), nullable=False, default='default.jpg')
     bio = db.Column(db.String(255), nullable=True)
+    # Running count of this user's reviews, maintained by app.leaderboards
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     reviews = db.relationship('Review', backref='author', lazy=True, cascade="all, delete-orphan")
     favorited_items = db.relationship('Item', secondary=favorites, backref=db.backref('favorited_by', lazy='dynamic'))
 
+    @property
+    def favorite_ids(self):
+        """Ids of the user's favorite items, for membership checks without loading the items."""
+        if '_favorite_ids' not in self.__dict__:
+            rows = db.session.execute(select(favorites.c.item_id).where(favorites.c.user_id == self.id))
+            self._favorite_ids = frozenset(item_id for item_id, in rows)
+        return self._favorite_ids
+
 class Item(db.Model):
+    # The menu pages through items by (name, id), optionally within one category
+    __table_args__ = (
+        db.Index('ix_item_category_name', 'category', 'name', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
     # Add the image_url column
@@ -34,32 +117,160 @@ class Item(db.Model):
     category = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text, nullable=True)
     reviews = db.relationship('Review', backref='item', lazy=True, cascade="all, delete-orphan")
+    # Running aggregates over this item's reviews. They are updated whenever a
+    # review is added or removed, so the properties below never load Item.reviews.
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    sentiment_sum = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    sentiment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
-    # ... (properties like avg_rating remain the same) ...
     @property
     def avg_rating(self):
-        if not self.reviews: return 0
-        return round(sum(r.rating for r in self.reviews) / len(self.reviews), 1)
+        if not self.rating_count: return 0
+        return round(self.rating_sum / self.rating_count, 1)
     
     @property
     def review_count(self):
-        return len(self.reviews)
+        return self.rating_count or 0
 
     @property
     def avg_sentiment(self):
-        if not self.reviews: return 0
-        sentiments = [r.sentiment for r in self.reviews if r.sentiment is not None]
-        if not sentiments: return 0
-        return round(sum(sentiments) / len(sentiments), 2)
+        if not self.sentiment_count: return 0
+        return round(self.sentiment_sum / self.sentiment_count, 2)
+
+    # The updates are written as SQL expressions (column + n) rather than
+    # Python arithmetic so concurrent writers can't overwrite each other.
+    def record_review(self, review):
+        self._apply_review(review, 1)
+
+    def discard_review(self, review):
+        self._apply_review(review, -1)
+
+    def record_sentiment(self, sentiment, sign=1):
+        if sentiment is None: return
+        self.sentiment_sum = Item.sentiment_sum + sign * sentiment
+        self.sentiment_count = Item.sentiment_count + sign
+
+    def _apply_review(self, review, sign):
+        self.rating_sum = Item.rating_sum + sign * review.rating
+        self.rating_count = Item.rating_count + sign
+        self.record_sentiment(review.sentiment, sign)
+
+
+def rebuild_item_aggregates(item_ids=None):
+    """Recompute the running review aggregates on Item from the review table."""
+    totals = db.session.query(
+        Review.item_id,
+        func.sum(Review.rating),
+        func.count(Review.id),
+        func.sum(Review.sentiment),
+        func.count(Review.sentiment),
+    ).group_by(Review.item_id)
+    reset = update(Item).values(rating_sum=0, rating_count=0, sentiment_sum=0.0, sentiment_count=0)
+    if item_ids is not None:
+        totals = totals.filter(Review.item_id.in_(item_ids))
+        reset = reset.where(Item.id.in_(item_ids))
+    rows = [
+        {'id': item_id, 'rating_sum': rating_sum, 'rating_count': rating_count,
+         'sentiment_sum': sentiment_sum or 0.0, 'sentiment_count': sentiment_count}
+        for item_id, rating_sum, rating_count, sentiment_sum, sentiment_count in totals
+    ]
+    db.session.execute(reset)
+    if rows:
+        db.session.execute(update(Item), rows)
+    db.session.commit()
+    return len(rows)
 
 
 class Review(db.Model):
-    # ... (no changes to the Review model) ...
+    # Keyset pagination walks these newest-first per item, per user and overall
+    __table_args__ = (
+        db.Index('ix_review_item_posted', 'item_id', 'date_posted', 'id'),
+        db.Index('ix_review_user_posted', 'user_id', 'date_posted', 'id'),
+        db.Index('ix_review_posted', 'date_posted', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     rating = db.Column(db.Integer, nullable=False)
     text = db.Column(db.Text, nullable=False)
     image_file = db.Column(db.String(120), nullable=True)
-    sentiment = db.Column(db.Float, nullable=True)
+    # True while the upload is waiting in static/uploads/pending for its thumbnail
+    image_pending = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
+    sentiment = db.Column(db.Float, nullable=True) # NULL until app.ingest has scored it
+    sentiment_version = db.Column(db.String(32), nullable=True) # app.sentiment.ANALYZER_VERSION
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
+
+
+# --- Leaderboard Tables ---
+class ReviewBucket(db.Model):
+    # Number of reviews an item received in one hour or one day. Trending is a
+    # sliding-window sum over these rows instead of a scan of the review table.
+    __table_args__ = (
+        # Covers the trending window sums and the pruning of old hourly rows
+        db.Index('ix_review_bucket_window', 'granularity', 'bucket_start', 'item_id', 'review_count'),
+    )
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), primary_key=True)
+    granularity = db.Column(db.String(4), primary_key=True) # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class LeaderboardEntry(db.Model):
+    # Precomputed top-N lists read by the homepage
+    board = db.Column(db.String(20), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    subject_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+class Recommendation(db.Model):
+    # Per-user top-K items, precomputed by app.recommendations
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+# --- Analytics Rollups ---
+class DailyStatsMixin:
+    # Totals over one day's reviews, maintained by app.analytics
+    day = db.Column(db.Date, primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    # Rating histogram: how many of the reviews gave 1, 2, ... 5 stars
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+    sentiment_sum = db.Column(db.Float, nullable=False, default=0.0)
+    sentiment_count = db.Column(db.Integer, nullable=False, default=0)
+    # Distinct authors that day; unlike the rest this can't be summed over days
+    reviewer_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ItemDailyStats(DailyStatsMixin, db.Model):
+    __tablename__ = 'item_daily_stats'
+    # The primary key serves one item's series; this serves re-rolling a day
+    __table_args__ = (
+        db.Index('ix_item_daily_stats_day', 'day'),
+    )
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), primary_key=True)
+
+
+class CategoryDailyStats(DailyStatsMixin, db.Model):
+    __tablename__ = 'category_daily_stats'
+    # category '_all' holds the totals over every item
+    __table_args__ = (
+        db.Index('ix_category_daily_stats_day', 'day'),
+    )
+    category = db.Column(db.String(50), primary_key=True)
+
+
+class RollupState(db.Model):
+    # How far the rollups have got: reviews up to last_review_id are counted
+    name = db.Column(db.String(20), primary_key=True)
+    last_review_id = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,119 @@
+# app/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import DateTime, tuple_
+
+
+# --- Cursors ---
+# A cursor is the sort key of the row on either edge of a page, e.g.
+# (date_posted, id), so the next page is a range scan on the matching
+# composite index instead of an OFFSET that reads and discards rows.
+def encode_cursor(values):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        # Cursors come from the query string: anything but one scalar per column is rejected
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        if not all(v is None or isinstance(v, (str, int, float)) for v in values):
+            return None
+        return [datetime.fromisoformat(v) if isinstance(col.type, DateTime) else v
+                for v, col in zip(values, columns)]
+    except (ValueError, TypeError):
+        return None
+
+
+# --- Keyset Pagination ---
+class KeysetPage:
+    """One page of `query` ordered by `columns`, evaluated on first use.
+
+    Templates can hand the page to a cached fragment: when the fragment is
+    served from cache the query never runs. `columns` must end in a unique
+    column (normally the primary key) so the order is total.
+    """
+
+    def __init__(self, query, columns, after=None, before=None, per_page=20, descending=True, total=None):
+        self.query = query
+        self.columns = columns
+        self.after = after
+        self.before = before
+        self.per_page = per_page
+        self.descending = descending
+        self.total = total
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        key = tuple_(*self.columns)
+        forward = [c.desc() if self.descending else c.asc() for c in self.columns]
+        backward = [c.asc() if self.descending else c.desc() for c in self.columns]
+        after = decode_cursor(self.after, self.columns) if self.after else None
+        before = decode_cursor(self.before, self.columns) if self.before else None
+        if before is not None:
+            # Walk backwards from the cursor, then flip the rows back into display order
+            bound = key > tuple(before) if self.descending else key < tuple(before)
+            rows = self.query.filter(bound).order_by(*backward).limit(self.per_page + 1).all()
+            more_before = len(rows) > self.per_page
+            self.items = rows[:self.per_page][::-1]
+            self.has_prev, self.has_next = more_before, True
+        else:
+            query = self.query
+            if after is not None:
+                query = query.filter(key < tuple(after) if self.descending else key > tuple(after))
+            rows = query.order_by(*forward).limit(self.per_page + 1).all()
+            self.items = rows[:self.per_page]
+            self.has_prev, self.has_next = after is not None, len(rows) > self.per_page
+        self._loaded = True
+
+    def _edge(self, row):
+        return encode_cursor([getattr(row, col.key) for col in self.columns])
+
+    def __getattr__(self, name):
+        # items / has_prev / has_next are filled in by _load() on first access
+        if name in ('items', 'has_prev', 'has_next'):
+            self._load()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def next_cursor(self):
+        return self._edge(self.items[-1]) if self.has_next and self.items else None
+
+    @property
+    def prev_cursor(self):
+        return self._edge(self.items[0]) if self.has_prev and self.items else None
+
+
+class CachedKeysetPage(KeysetPage):
+    # Caches the ids and cursors of the page under `cache_key`; a hit costs one
+    # primary-key lookup instead of the filtered, ordered scan.
+    def __init__(self, *args, cache_key, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_key = f'{cache_key}|after={self.after},before={self.before},per_page={self.per_page}'
+
+    def _load(self):
+        if self._loaded:
+            return
+        cache = current_app.extensions['cache']
+        data = cache.get(self.cache_key)
+        if data is None:
+            super()._load()
+            data = {'ids': [row.id for row in self.items], 'has_prev': self.has_prev, 'has_next': self.has_next}
+            cache.set(self.cache_key, data)
+            return
+        model = self.query.column_descriptions[0]['entity']
+        rows = {row.id: row for row in model.query.filter(model.id.in_(data['ids']))} if data['ids'] else {}
+        self.items = [rows[i] for i in data['ids'] if i in rows]
+        self.has_prev, self.has_next = data['has_prev'], data['has_next']
+        self._loaded = True
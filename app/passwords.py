@@ -0,0 +1,103 @@
+# app/passwords.py
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+import bcrypt
+
+log = logging.getLogger(__name__)
+
+# bcrypt only looks at this many bytes, and bcrypt 5 refuses longer passwords
+MAX_PASSWORD_BYTES = 72
+
+
+class Overloaded(Exception):
+    # Too many password checks already queued; the caller should answer 503
+    pass
+
+
+# --- Process Pool Workers ---
+# Module-level so they can be pickled over to the pool's processes
+def _hash(args):
+    password, rounds = args
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(args):
+    pw_hash, password = args
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+    except ValueError:
+        # Malformed hash, or a password bcrypt refuses (over 72 bytes)
+        return False
+
+
+def hash_rounds(pw_hash):
+    """The cost factor a bcrypt hash was made with ('$2b$12$...' -> 12)."""
+    try:
+        return int(pw_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+# --- Password Hasher Extension ---
+class PasswordHasher:
+    """bcrypt hashing and checking off the request threads.
+
+    Work goes to a small process pool so a burst of logins can't take every
+    CPU from page views. At most PASSWORD_HASH_WORKERS checks run at once and
+    PASSWORD_HASH_MAX_PENDING more may wait; past that, callers get Overloaded
+    straight away instead of queueing. PASSWORD_HASH_WORKERS = 0 runs inline.
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.workers = 0
+        self.timeout = 10
+        self.counters = {'hashed': 0, 'checked': 0, 'rehashed': 0, 'rejected': 0}
+        self._slots = None
+        self._pool = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        self._slots = threading.BoundedSemaphore(self.workers + app.config.get('PASSWORD_HASH_MAX_PENDING', 32))
+        app.extensions['passwords'] = self
+
+    def _run(self, fn, args):
+        if not self.workers:
+            return fn(args)
+        if not self._slots.acquire(blocking=False):
+            self.counters['rejected'] += 1
+            raise Overloaded()
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # 'spawn' because the app's other threads are already running
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        future = self._pool.submit(fn, args)
+        # The slot is held until the work is done, even if this caller gives up
+        future.add_done_callback(lambda f: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            log.warning('Password check still queued after %ss', self.timeout)
+            self.counters['rejected'] += 1
+            raise Overloaded()
+
+    def hash(self, password, rounds=None):
+        self.counters['hashed'] += 1
+        return self._run(_hash, (password, rounds or self.rounds))
+
+    def check(self, pw_hash, password):
+        self.counters['checked'] += 1
+        return self._run(_check, (pw_hash, password))
+
+    def needs_rehash(self, pw_hash):
+        """True when the hash was made with a different cost than BCRYPT_LOG_ROUNDS."""
+        return hash_rounds(pw_hash) != self.rounds
@@ -0,0 +1,121 @@
+# app/queryplan.py
+
+import re
+from flask import current_app
+from sqlalchemy import event
+from app import db, cache, leaderboards, analytics
+from app.cache import NullBackend
+from app.models import User, Item, Review
+from app.pagination import encode_cursor
+
+# SQLite reports a table read without any index as "SCAN <table>". Walking a
+# whole index ("SCAN t USING INDEX i") is fine for an unfiltered, LIMITed
+# listing, but in a statement with a WHERE clause it means the filter isn't
+# served by the index and every row is visited. FTS lookups show up as
+# "SCAN t VIRTUAL TABLE" and are not full scans.
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+INDEX_SCAN = re.compile(r'^SCAN (\w+) USING (?:COVERING )?INDEX ')
+
+
+def _pages(item, user, admin):
+    """(label, logged-in user or None, path) for every page worth checking."""
+    review = Review.query.filter_by(item_id=item.id).order_by(Review.date_posted.desc(), Review.id.desc()).first()
+    word = item.name.split()[0]
+    pages = [
+        ('home', None, '/'),
+        ('home (logged in)', user, '/'),
+        ('menu', None, '/menu'),
+        ('menu by category', None, f'/menu?category={item.category}'),
+        ('menu search', None, f'/menu?q={word}'),
+        ('menu page 2', None, f'/menu?after={encode_cursor([item.name, item.id])}'),
+        ('item', None, f'/item/{item.id}'),
+        ('user profile', None, f'/user/{user.username}'),
+        ('favorites', user, '/favorites'),
+        ('search items', None, f'/search?q={word}'),
+        ('search reviews', None, f'/search?q={word}&scope=reviews'),
+        ('admin', admin, '/admin'),
+        ('admin trends', admin, '/admin/trends?days=365'),
+        ('admin trends by item', admin, f'/admin/trends?item={item.name}&bucket=week'),
+    ]
+    if review is not None:
+        cursor = encode_cursor([review.date_posted, review.id])
+        pages += [
+            ('item page 2', None, f'/item/{item.id}?after={cursor}'),
+            ('user profile page 2', None, f'/user/{user.username}?after={cursor}'),
+            ('admin page 2', admin, f'/admin?after={cursor}'),
+        ]
+    return pages
+
+
+def _capture(client, path):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+    engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', record)
+    try:
+        # A fresh app context, so `g` (and the logged-in user) isn't shared between pages
+        with current_app.app_context():
+            response = client.get(path)
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', record)
+    return response.status_code, statements
+
+
+def explain(statement, parameters):
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(statement, plan):
+    filtered = re.search(r'\bWHERE\b', statement, re.IGNORECASE) is not None
+    scans = []
+    for line in plan:
+        match = FULL_SCAN.match(line) or (filtered and INDEX_SCAN.match(line))
+        if match:
+            scans.append(match.group(1))
+    return scans
+
+
+def check_pages():
+    """Request every page and EXPLAIN each SELECT it ran.
+
+    Returns a list of (page, status, statement, plan, full scans). The
+    fragment cache is bypassed so cached pages still run their queries,
+    and the leaderboards and analytics rollups are refreshed first so the
+    pages read them rather than recomputing them.
+    """
+    item = Item.query.order_by(Item.rating_count.desc()).first()
+    user = User.query.filter_by(is_admin=False).order_by(User.review_count.desc()).first()
+    admin = User.query.filter_by(is_admin=True).first()
+    if item is None or user is None or admin is None:
+        raise ValueError('Needs at least one item, one user and one admin (e.g. run seed.py).')
+    pages = _pages(item, user, admin)
+    leaderboards.refresh()
+    analytics.refresh()
+
+    backend, cache.backend = cache.backend, NullBackend()
+    results = []
+    try:
+        for label, login_as, path in pages:
+            client = current_app.test_client()
+            if login_as is not None:
+                with client.session_transaction() as session:
+                    session['_user_id'] = str(login_as.id)
+                    session['_fresh'] = True
+            status, statements = _capture(client, path)
+            seen = set()
+            for statement, parameters in statements:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                plan = explain(statement, parameters)
+                scans = full_scans(statement, plan)
+                results.append((label, status, statement, plan, scans))
+    finally:
+        cache.backend = backend
+    return results
@@ -0,0 +1,49 @@
+# app/ratelimit.py
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """Token buckets keyed by strings such as 'login-user:troy' or 'login-ip:10.0.0.5'.
+
+    A limit is (capacity, period): up to `capacity` hits in a burst, refilled
+    at capacity/period tokens per second. Buckets are per process, like the
+    memory cache, so with N workers a client may get up to N times the limit.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.rejected = 0
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def hit(self, *limits):
+        """Take one token from every (key, capacity, period) bucket, or from none.
+
+        Returns 0 on success, otherwise the seconds until every bucket has a
+        token again.
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for key, capacity, period in limits:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                levels.append(min(capacity, tokens + (now - updated) * capacity / period))
+            waits = [(1 - tokens) * period / capacity
+                     for tokens, (_, capacity, period) in zip(levels, limits) if tokens < 1]
+            if waits:
+                self.rejected += 1
+                return math.ceil(max(waits))
+            for tokens, (key, _, _) in zip(levels, limits):
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
@@ -0,0 +1,195 @@
+# app/recommendations.py
+
+import hashlib
+import os
+import threading
+from array import array
+from datetime import datetime
+import numpy as np
+from scipy import sparse
+from flask import current_app
+from sqlalchemy import insert
+from app import db, cache, tasks
+from app.models import Item, Review, Recommendation, favorites
+
+# A user's preference for an item: rating relative to the middle of the
+# 1-5 scale, plus a bonus if they favorited it.
+NEUTRAL_RATING = 3.0
+FAVORITE_WEIGHT = 1.0
+# Similarities kept per item; bounds the model size and the scoring cost
+NEIGHBOURS_PER_ITEM = 50
+USER_CHUNK = 1000
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _model_path():
+    # One model per database, so a bench or test database never reads the dev one
+    stem, ext = os.path.splitext(current_app.config['RECOMMENDER_MODEL_FILE'])
+    database = hashlib.blake2b(current_app.config['SQLALCHEMY_DATABASE_URI'].encode(), digest_size=4).hexdigest()
+    return os.path.join(current_app.instance_path, f'{stem}.{database}{ext}')
+
+
+# --- Rating Matrix ---
+def _preference_rows(user_ids=None):
+    """Yield (user_id, item_id, preference) triples from reviews and favorites."""
+    reviews = db.session.query(Review.user_id, Review.item_id, Review.rating)
+    favs = db.session.query(favorites.c.user_id, favorites.c.item_id)
+    if user_ids is not None:
+        reviews = reviews.filter(Review.user_id.in_(user_ids))
+        favs = favs.filter(favorites.c.user_id.in_(user_ids))
+    for user_id, item_id, rating in reviews.yield_per(50000):
+        yield user_id, item_id, rating - NEUTRAL_RATING
+    for user_id, item_id in favs.yield_per(50000):
+        yield user_id, item_id, FAVORITE_WEIGHT
+
+
+def _matrix(triples, item_index, user_index=None):
+    """Users x items preference matrix. Without a user_index, rows are user ids."""
+    # Typed arrays keep millions of entries compact while streaming ('q' is
+    # 64-bit everywhere; 'l' is only 32-bit on Windows)
+    rows, cols, values = array('q'), array('q'), array('f')
+    for user_id, item_id, value in triples:
+        col = item_index.get(item_id)
+        if col is None:
+            continue
+        rows.append(user_index[user_id] if user_index is not None else user_id)
+        cols.append(col)
+        values.append(value)
+    n_users = len(user_index) if user_index is not None else (max(rows) + 1 if rows else 0)
+    # Duplicate (user, item) entries, e.g. a review plus a favorite, are summed
+    return sparse.csr_matrix((np.frombuffer(values, dtype=np.float32), (np.frombuffer(rows, dtype=np.int64), np.frombuffer(cols, dtype=np.int64))),
+                             shape=(n_users, len(item_index)), dtype=np.float32)
+
+
+def _item_similarity(matrix):
+    """Cosine similarity between item columns, pruned to the strongest neighbours."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel()
+    norms[norms == 0] = 1.0
+    normalized = matrix @ sparse.diags(1.0 / norms)
+    similarity = (normalized.T @ normalized).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    # Keep only the top neighbours in each row
+    pruned = sparse.lil_matrix(similarity.shape, dtype=np.float32)
+    for row in range(similarity.shape[0]):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        if end - start > NEIGHBOURS_PER_ITEM:
+            keep = np.argpartition(-similarity.data[start:end], NEIGHBOURS_PER_ITEM)[:NEIGHBOURS_PER_ITEM] + start
+        else:
+            keep = np.arange(start, end)
+        pruned.rows[row] = list(similarity.indices[keep])
+        pruned.data[row] = list(similarity.data[keep])
+    return pruned.tocsr()
+
+
+# --- Model Persistence ---
+def _save_model(similarity, item_ids):
+    os.makedirs(current_app.instance_path, exist_ok=True)
+    path = _model_path()
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, data=similarity.data, indices=similarity.indices, indptr=similarity.indptr,
+                        shape=similarity.shape, item_ids=item_ids)
+    os.replace(tmp_path, path)
+
+
+def _load_model():
+    """Return (similarity, item_ids, item_index), reloading when the file on disk changes."""
+    global _model
+    path = _model_path()
+    if not os.path.exists(path):
+        return None
+    stamp = (path, os.path.getmtime(path))
+    with _model_lock:
+        if _model is None or _model[0] != stamp:
+            with np.load(path) as f:
+                similarity = sparse.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+                item_ids = f['item_ids']
+            _model = (stamp, similarity, item_ids, {int(item_id): i for i, item_id in enumerate(item_ids)})
+        return _model[1:]
+
+
+def _current_item_ids():
+    return np.array([item_id for item_id, in db.session.query(Item.id).order_by(Item.id)], dtype=np.int64)
+
+
+def build_model(item_ids=None):
+    """Recompute the item-item similarity matrix from every review and favorite."""
+    item_ids = _current_item_ids() if item_ids is None else item_ids
+    item_index = {int(item_id): i for i, item_id in enumerate(item_ids)}
+    matrix = _matrix(_preference_rows(), item_index)
+    _save_model(_item_similarity(matrix), item_ids)
+    return _load_model()
+
+
+# --- Scoring ---
+def _top_k(scores, seen, k):
+    scores = np.where(seen, -np.inf, scores)
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def _store(user_ids, top_lists, now):
+    Recommendation.query.filter(Recommendation.user_id.in_(user_ids)).delete(synchronize_session=False)
+    rows = [
+        {'user_id': user_id, 'rank': rank, 'item_id': item_id, 'score': score, 'computed_at': now}
+        for user_id, top in zip(user_ids, top_lists)
+        for rank, (item_id, score) in enumerate(top, start=1)
+    ]
+    if rows:
+        db.session.execute(insert(Recommendation), rows)
+
+
+def refresh_users(user_ids):
+    """Recompute and store the top-K list for the given users against the current model."""
+    model = _load_model()
+    current_ids = _current_item_ids()
+    if model is None or not np.array_equal(model[1], current_ids):
+        # Missing, or built before items were added: its ids would be stale
+        model = build_model(current_ids)
+    similarity, item_ids, item_index = model
+    user_ids = list(user_ids)
+    k = current_app.config['RECOMMENDATIONS_PER_USER']
+    now = datetime.utcnow()
+    for start in range(0, len(user_ids), USER_CHUNK):
+        chunk = user_ids[start:start + USER_CHUNK]
+        user_index = {user_id: i for i, user_id in enumerate(chunk)}
+        matrix = _matrix(_preference_rows(chunk), item_index, user_index)
+        scores = np.asarray((matrix @ similarity).todense())
+        # Anything the user already reviewed or favorited, even with a net preference of 0
+        seen = np.zeros(matrix.shape, dtype=bool)
+        for row in range(len(chunk)):
+            seen[row, matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]] = True
+        top_lists = []
+        for row in range(len(chunk)):
+            top = _top_k(scores[row], seen[row], k)
+            top_lists.append([(int(item_ids[i]), float(scores[row, i])) for i in top])
+        _store(chunk, top_lists, now)
+        db.session.commit()
+    cache.invalidate('recommendations')
+
+
+def rebuild():
+    """Rebuild the similarity model and every user's recommendations."""
+    build_model()
+    user_ids = sorted({user_id for user_id, in db.session.query(Review.user_id).distinct()} |
+                      {user_id for user_id, in db.session.query(favorites.c.user_id).distinct()})
+    refresh_users(user_ids)
+    return len(user_ids)
+
+
+@tasks.handler('recommend')
+def process_refreshes(payloads):
+    refresh_users({payload['user_id'] for payload in payloads})
+
+
+# --- Read Path ---
+def for_user(user_id, limit=3):
+    """The user's stored recommendations, best first, in one indexed query."""
+    return (Item.query.join(Recommendation, Recommendation.item_id == Item.id)
+            .filter(Recommendation.user_id == user_id)
+            .order_by(Recommendation.rank)
+            .limit(limit).all())
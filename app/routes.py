@@ -2,90 +2,97 @@
 
 import os
 import secrets
+from datetime import datetime, timedelta
 from PIL import Image
-from flask import render_template, url_for, flash, redirect, request, Blueprint, current_app
-from app import db, bcrypt
+from flask import render_template, url_for, flash, redirect, request, Blueprint, current_app, jsonify, abort
+from flask import Response, stream_with_context
+from app import db, cache, tasks, metrics, passwords, limiter
+from app.database import read_replica
+from app.pagination import KeysetPage, CachedKeysetPage
 # Add UpdateProfileForm to this import line
 from app.forms import RegistrationForm, LoginForm, ReviewForm, AddItemForm, UpdateProfileForm
-from app.models import User, Item, Review
+from app.models import User, Item, Review, add_favorite, remove_favorite
+from app import leaderboards, recommendations, search, images, transfer, analytics
 from flask_login import login_user, current_user, logout_user, login_required
 from sqlalchemy import func
-from datetime import datetime, timedelta
-from collections import defaultdict
-from textblob import TextBlob
+from sqlalchemy.orm import joinedload
+from app.ingest import upload_dirs
+from app.passwords import Overloaded
 
 main = Blueprint('main', __name__)
 
 
+main.add_app_template_global(images.srcset, 'image_srcset')
+main.add_app_template_global(images.image_url)
+main.add_app_template_global(images.is_processed, 'image_is_processed')
+
+
 # --- Helper Function for Saving Pictures ---
-def save_picture(form_picture, type='review'):
+def save_picture(form_picture, folder='profile_pics'):
+    # Returns the content key the sizes were saved under, or None if the
+    # upload isn't an image Pillow can (safely) decode
+    upload_path = os.path.join(current_app.root_path, 'static', folder)
+    with metrics.timer('pillow'):
+        try:
+            return images.process_image(form_picture.read(), upload_path, images.SIZES[folder],
+                                        current_app.config['MAX_IMAGE_PIXELS'])
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+
+def stage_review_picture(form_picture):
+    # Store the raw upload; app.ingest makes the sizes in the background
     random_hex = secrets.token_hex(8)
     _, f_ext = os.path.splitext(form_picture.filename)
     picture_fn = random_hex + f_ext
-    
-    if type == 'profile':
-        # Correctly join path from the app's root_path
-        upload_path = os.path.join(current_app.root_path, 'static/profile_pics')
-        output_size = (150, 150)
-    else: # review
-        upload_path = os.path.join(current_app.root_path, 'static/uploads')
-        output_size = (500, 500)
-
-    # Ensure the upload directory exists
-    os.makedirs(upload_path, exist_ok=True)
-    picture_path = os.path.join(upload_path, picture_fn)
-    
-    i = Image.open(form_picture)
-    i.thumbnail(output_size)
-    i.save(picture_path)
-
+    _, pending_path = upload_dirs()
+    os.makedirs(pending_path, exist_ok=True)
+    form_picture.save(os.path.join(pending_path, picture_fn))
     return picture_fn
 
-# --- Helper function for recommendations ---
-def get_recommendations(user):
-    reviewed_item_ids = [review.item_id for review in user.reviews]
-    category_ratings = defaultdict(lambda: {'total': 0, 'count': 0})
-    for review in user.reviews:
-        category = review.item.category
-        category_ratings[category]['total'] += review.rating
-        category_ratings[category]['count'] += 1
-    if not category_ratings:
-        return None, None
-    favorite_category = max(category_ratings, key=lambda cat: category_ratings[cat]['total'] / category_ratings[cat]['count'])
-    recommendations = Item.query.filter(Item.category == favorite_category, Item.id.notin_(reviewed_item_ids)).all()
-    recommendations.sort(key=lambda item: item.avg_rating, reverse=True)
-    return recommendations[:3], favorite_category
-
 # --- Main Routes ---
+# Not @read_replica: stale leaderboards are recomputed here, on the primary
 @main.route("/")
 @main.route("/home")
 def home():
-    top_items_query = db.session.query(Item, func.avg(Review.rating).label('average_rating')).join(Review).group_by(Item.id).order_by(func.avg(Review.rating).desc()).limit(3).all()
-    top_items = [item for item, avg_rating in top_items_query]
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    trending_items_query = db.session.query(Item, func.count(Review.id).label('review_count')).join(Review).filter(Review.date_posted >= seven_days_ago).group_by(Item.id).order_by(func.count(Review.id).desc()).limit(3).all()
-    trending_items = [item for item, count in trending_items_query]
-    top_reviewers_query = db.session.query(User, func.count(Review.id).label('review_count')).join(Review).group_by(User.id).order_by(func.count(Review.id).desc()).limit(5).all()
-    top_reviewers = top_reviewers_query
-    recommendations = None
-    recommended_for_category = None
+    top_items, trending_items, top_reviewers = leaderboards.homepage_boards()
+    top_items = top_items[:3]
+    trending_items = trending_items[:3]
+    top_reviewers = top_reviewers[:5]
+    recommended = None
     if current_user.is_authenticated:
-        recommendations, recommended_for_category = get_recommendations(current_user)
-    return render_template('index.html', top_items=top_items, trending_items=trending_items, recommendations=recommendations, recommended_for_category=recommended_for_category, top_reviewers=top_reviewers)
+        recommended = recommendations.for_user(current_user.id)
+    return render_template('index.html', top_items=top_items, trending_items=trending_items, recommendations=recommended, top_reviewers=top_reviewers)
 
 @main.route("/menu")
+@read_replica
 def menu():
-    page = request.args.get('page', 1, type=int)
+    after = request.args.get('after')
+    before = request.args.get('before')
     search_query = request.args.get('q')
     category_filter = request.args.get('category')
-    items_query = Item.query.order_by(Item.name.asc())
+    items_query = Item.query
     if search_query:
-        items_query = items_query.filter(Item.name.ilike(f'%{search_query}%'))
+        items_query = search.filter_items(items_query, search_query)
     if category_filter:
         items_query = items_query.filter(Item.category == category_filter)
-    items = items_query.paginate(page=page, per_page=6)
-    categories = db.session.query(Item.category).distinct().all()
-    return render_template('menu.html', title='Menu', items=items, categories=[c[0] for c in categories], search_query=search_query, category_filter=category_filter)
+    # Both results only change when an item is added, so they hang off the 'items' namespace
+    cache_key = cache.key('menu', 'items', q=search_query or '', category=category_filter or '')
+    items = CachedKeysetPage(items_query, [Item.name, Item.id], after=after, before=before,
+                             per_page=6, descending=False, cache_key=cache_key)
+    categories = cache.get_or_set(cache.key('menu_categories', 'items'),
+                                  lambda: [c[0] for c in db.session.query(Item.category).distinct()])
+    return render_template('menu.html', title='Menu', items=items, categories=categories, search_query=search_query, category_filter=category_filter)
+
+@main.route("/search")
+def search_results():
+    search_query = request.args.get('q', '')
+    scope = request.args.get('scope', 'items')
+    page = max(request.args.get('page', 1, type=int), 1)
+    items = search.search_items(search_query, page=page if scope == 'items' else 1)
+    reviews = search.search_reviews(search_query, page=page if scope == 'reviews' else 1)
+    results = reviews if scope == 'reviews' else items
+    return render_template('search.html', title='Search', search_query=search_query, scope=scope,
+                           items=items, reviews=reviews, results=results)
 
 @main.route("/item/<int:item_id>", methods=['GET', 'POST'])
 def item_detail(item_id):
@@ -97,15 +104,23 @@ def item_detail(item_id):
             return redirect(url_for('main.login', next=request.path))
         image_filename = None
         if form.picture.data:
-            image_filename = save_picture(form.picture.data)
-        review_text = form.text.data
-        sentiment_score = TextBlob(review_text).sentiment.polarity
-        review = Review(rating=form.rating.data, text=review_text, author=current_user, item=item, image_file=image_filename, sentiment=sentiment_score)
+            image_filename = stage_review_picture(form.picture.data)
+        # Sentiment and the thumbnail are filled in by the 'review' background job
+        review = Review(rating=form.rating.data, text=form.text.data, author=current_user, item=item,
+                        image_file=image_filename, image_pending=image_filename is not None)
         db.session.add(review)
+        item.record_review(review)
+        leaderboards.record_review(review)
         db.session.commit()
+        cache.invalidate(f'item:{item.id}', f'user:{current_user.id}', 'reviews')
+        tasks.enqueue('review', {'review_id': review.id})
+        tasks.enqueue('recommend', {'user_id': current_user.id})
         flash('Your review has been submitted!', 'success')
         return redirect(url_for('main.item_detail', item_id=item.id))
-    reviews = Review.query.filter_by(item_id=item.id).order_by(Review.date_posted.desc()).all()
+    # Evaluated lazily: the template only runs it when the cached fragment is stale
+    reviews = KeysetPage(Review.query.filter_by(item_id=item.id).options(joinedload(Review.author)),
+                         [Review.date_posted, Review.id], after=request.args.get('after'),
+                         before=request.args.get('before'), per_page=10, total=item.review_count)
     return render_template('item_detail.html', title=item.name, item=item, reviews=reviews, form=form)
 
 # --- Favorite Routes ---
@@ -113,9 +128,12 @@ def item_detail(item_id):
 @login_required
 def favorite_item(item_id):
     item = Item.query.get_or_404(item_id)
-    if item not in current_user.favorited_items:
-        current_user.favorited_items.append(item)
+    # Read before the commit expires current_user
+    user_id = current_user.id
+    if add_favorite(user_id, item.id):
         db.session.commit()
+        cache.invalidate(f'user:{user_id}')
+        tasks.enqueue('recommend', {'user_id': user_id})
         flash(f'"{item.name}" has been added to your favorites!', 'success')
     return redirect(url_for('main.item_detail', item_id=item.id))
 
@@ -123,16 +141,20 @@ def favorite_item(item_id):
 @login_required
 def unfavorite_item(item_id):
     item = Item.query.get_or_404(item_id)
-    if item in current_user.favorited_items:
-        current_user.favorited_items.remove(item)
+    # Read before the commit expires current_user
+    user_id = current_user.id
+    if remove_favorite(user_id, item.id):
         db.session.commit()
+        cache.invalidate(f'user:{user_id}')
+        tasks.enqueue('recommend', {'user_id': user_id})
         flash(f'"{item.name}" has been removed from your favorites.', 'success')
     return redirect(url_for('main.item_detail', item_id=item.id))
 
 @main.route("/favorites")
 @login_required
 def favorites():
-    items = current_user.favorited_items
+    item_ids = current_user.favorite_ids
+    items = Item.query.filter(Item.id.in_(item_ids)).order_by(Item.name).all() if item_ids else []
     return render_template('favorites.html', title='My Favorites', items=items)
 
 # --- Profile Routes ---
@@ -147,11 +169,20 @@ def edit_profile():
     form = UpdateProfileForm()
     if form.validate_on_submit():
         if form.picture.data:
-            picture_file = save_picture(form.picture.data, type='profile')
+            picture_file = save_picture(form.picture.data)
+            if picture_file is None:
+                flash('That picture could not be read; please try another image.', 'danger')
+                return redirect(url_for('main.edit_profile'))
             current_user.image_file = picture_file
+        username_changed = current_user.username != form.username.data
         current_user.username = form.username.data
         current_user.bio = form.bio.data
         db.session.commit()
+        cache.invalidate(f'user:{current_user.id}', 'users')
+        if username_changed:
+            # Review lists on item pages show the author's name
+            reviewed = db.session.query(Review.item_id).filter_by(user_id=current_user.id).distinct()
+            cache.invalidate(*(f'item:{item_id}' for item_id, in reviewed))
         flash('Your profile has been updated!', 'success')
         return redirect(url_for('main.profile'))
     elif request.method == 'GET':
@@ -160,19 +191,53 @@ def edit_profile():
     return render_template('edit_profile.html', title='Edit Profile', form=form)
 
 @main.route("/user/<string:username>")
+@read_replica
 def user_profile(username):
     user = User.query.filter_by(username=username).first_or_404()
-    reviews = Review.query.filter_by(author=user).order_by(Review.date_posted.desc()).all()
+    reviews = KeysetPage(Review.query.filter_by(user_id=user.id).options(joinedload(Review.item)),
+                         [Review.date_posted, Review.id], after=request.args.get('after'),
+                         before=request.args.get('before'), per_page=10, total=user.review_count)
     return render_template('user_profile.html', user=user, reviews=reviews, title=f"{user.username}'s Profile")
 
 # --- Auth Routes ---
+# --- Authentication Helpers ---
+def _rate_limited(*buckets):
+    # (bucket key, config name of its (capacity, period) limit) pairs
+    if not current_app.config['LOGIN_RATE_LIMIT']:
+        return 0
+    return limiter.hit(*((key, *current_app.config[limit]) for key, limit in buckets))
+
+def _too_many(template, title, form, retry_after):
+    flash(f'Too many attempts. Please wait {retry_after} seconds and try again.', 'danger')
+    return render_template(template, title=title, form=form), 429, {'Retry-After': str(retry_after)}
+
+def _overloaded(template, title, form):
+    flash('We are handling a lot of sign-ins right now. Please try again in a moment.', 'warning')
+    return render_template(template, title=title, form=form), 503, {'Retry-After': '5'}
+
+def _rehash(user, password):
+    # BCRYPT_LOG_ROUNDS changed since this hash was made; the password was just verified
+    try:
+        user.password = passwords.hash(password)
+    except Overloaded:
+        return  # Try again on a quieter login
+    db.session.commit()
+    passwords.counters['rehashed'] += 1
+    cache.invalidate(f'user:{user.id}')
+
 @main.route("/register", methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
         return redirect(url_for('main.home'))
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        retry_after = _rate_limited((f'register-ip:{request.remote_addr}', 'LOGIN_LIMIT_PER_IP'))
+        if retry_after:
+            return _too_many('register.html', 'Register', form, retry_after)
+        try:
+            hashed_password = passwords.hash(form.password.data)
+        except Overloaded:
+            return _overloaded('register.html', 'Register', form)
         user = User(username=form.username.data, password=hashed_password)
         db.session.add(user)
         db.session.commit()
@@ -186,8 +251,19 @@ def login():
         return redirect(url_for('main.home'))
     form = LoginForm()
     if form.validate_on_submit():
+        # Checked before the user lookup and bcrypt, so a flood costs almost nothing
+        retry_after = _rate_limited((f'login-user:{form.username.data.lower()}', 'LOGIN_LIMIT_PER_USERNAME'),
+                                    (f'login-ip:{request.remote_addr}', 'LOGIN_LIMIT_PER_IP'))
+        if retry_after:
+            return _too_many('login.html', 'Login', form, retry_after)
         user = User.query.filter_by(username=form.username.data).first()
-        if user and bcrypt.check_password_hash(user.password, form.password.data):
+        try:
+            valid = user is not None and passwords.check(user.password, form.password.data)
+        except Overloaded:
+            return _overloaded('login.html', 'Login', form)
+        if valid:
+            if passwords.needs_rehash(user.password):
+                _rehash(user, form.password.data)
             login_user(user)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('main.home'))
@@ -212,6 +288,7 @@ def add_item():
         item = Item(name=form.name.data, category=form.category.data, description=form.description.data)
         db.session.add(item)
         db.session.commit()
+        cache.invalidate('items')
         flash(f'Item "{item.name}" has been added!', 'success')
         return redirect(url_for('main.menu'))
     return render_template('add_item.html', title='Add New Item', form=form)
@@ -222,7 +299,10 @@ def admin_dashboard():
     if not current_user.is_admin:
         flash('You do not have permission to access this page.', 'danger')
         return redirect(url_for('main.home'))
-    reviews = Review.query.order_by(Review.date_posted.desc()).all()
+    total = db.session.query(func.count(Review.id)).scalar()
+    reviews = KeysetPage(Review.query.options(joinedload(Review.author), joinedload(Review.item)),
+                         [Review.date_posted, Review.id], after=request.args.get('after'),
+                         before=request.args.get('before'), per_page=50, total=total)
     return render_template('admin.html', title='Admin Dashboard', reviews=reviews)
 
 @main.route("/admin/delete_review/<int:review_id>", methods=['POST'])
@@ -232,7 +312,75 @@ def delete_review(review_id):
         flash('You do not have permission to perform this action.', 'danger')
         return redirect(url_for('main.home'))
     review_to_delete = Review.query.get_or_404(review_id)
+    affected = (f'item:{review_to_delete.item_id}', f'user:{review_to_delete.user_id}', 'reviews')
+    posted_day = review_to_delete.date_posted.date().isoformat()
+    review_to_delete.item.discard_review(review_to_delete)
+    leaderboards.discard_review(review_to_delete)
     db.session.delete(review_to_delete)
     db.session.commit()
+    cache.invalidate(*affected)
+    tasks.enqueue('recommend', {'user_id': review_to_delete.user_id})
+    tasks.enqueue('rollup', {'day': posted_day})
     flash('The review has been deleted.', 'success')
     return redirect(url_for('main.admin_dashboard'))
+
+@main.route("/admin/export/<kind>.csv")
+@login_required
+@read_replica
+def export_csv(kind):
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page.', 'danger')
+        return redirect(url_for('main.home'))
+    if kind not in transfer.EXPORTS:
+        abort(404)
+    # Rows are fetched and written in batches while the response streams
+    return Response(stream_with_context(transfer.csv_chunks(kind)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={kind}.csv'})
+
+# Not @read_replica: stale rollups are refreshed here, on the primary
+@main.route("/admin/trends")
+@login_required
+def admin_trends():
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page.', 'danger')
+        return redirect(url_for('main.home'))
+    refreshed_at = analytics.ensure_fresh()
+    days = min(max(request.args.get('days', 90, type=int), 7), 730)
+    bucket = 'week' if request.args.get('bucket') == 'week' else 'day'
+    category = request.args.get('category') or None
+    item_name = request.args.get('item', '').strip()
+    item = Item.query.filter_by(name=item_name).first() if item_name else None
+    if item_name and item is None:
+        flash(f'No menu item is called "{item_name}".', 'warning')
+    end = datetime.utcnow().date() + timedelta(days=1)
+    start = end - timedelta(days=days)
+    # Both come from the daily rollups, so the cost doesn't grow with the review table
+    series = analytics.trend(start, end, item_id=item.id if item else None, category=category, bucket=bucket)
+    categories = analytics.category_summary(start, end)
+    return render_template('admin_trends.html', title='Trends', series=series, categories=categories,
+                           days=days, bucket=bucket, category=category, item=item,
+                           refreshed_at=refreshed_at)
+
+@main.route("/admin/cache")
+@login_required
+def cache_stats():
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page.', 'danger')
+        return redirect(url_for('main.home'))
+    return jsonify(cache.stats())
+
+@main.route("/admin/tasks")
+@login_required
+def task_stats():
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page.', 'danger')
+        return redirect(url_for('main.home'))
+    return jsonify(tasks.stats())
+
+@main.route("/admin/queries")
+@login_required
+def query_samples():
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page.', 'danger')
+        return redirect(url_for('main.home'))
+    return jsonify(metrics.samples())
@@ -0,0 +1,192 @@
+# app/search.py
+
+import math
+import re
+from sqlalchemy import event, text
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import Item, Review
+
+# SQLite: FTS5 tables over `item` and `review` (external content, so the text
+# is not stored twice), kept in sync by triggers. Any write path, including
+# bulk imports, updates the index without the route having to remember to.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5(
+        name, description, category,
+        content='item', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS review_fts USING fts5(
+        text, content='review', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS item_fts_insert AFTER INSERT ON item BEGIN
+        INSERT INTO item_fts(rowid, name, description, category) VALUES (new.id, new.name, new.description, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS item_fts_delete AFTER DELETE ON item BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, description, category) VALUES ('delete', old.id, old.name, old.description, old.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS item_fts_update AFTER UPDATE OF name, description, category ON item BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, description, category) VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO item_fts(rowid, name, description, category) VALUES (new.id, new.name, new.description, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS review_fts_insert AFTER INSERT ON review BEGIN
+        INSERT INTO review_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS review_fts_delete AFTER DELETE ON review BEGIN
+        INSERT INTO review_fts(review_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS review_fts_update AFTER UPDATE OF text ON review BEGIN
+        INSERT INTO review_fts(review_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO review_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+SQLITE_DROP = ['DROP TABLE IF EXISTS item_fts', 'DROP TABLE IF EXISTS review_fts']
+
+# Postgres: expression GIN indexes, which the planner keeps current by itself
+ITEM_TSVECTOR = ("setweight(to_tsvector('english', item.name), 'A') || "
+                 "setweight(to_tsvector('english', item.category), 'B') || "
+                 "setweight(to_tsvector('english', coalesce(item.description, '')), 'C')")
+REVIEW_TSVECTOR = "to_tsvector('english', review.text)"
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_item_search ON item USING gin (({ITEM_TSVECTOR}))",
+    f"CREATE INDEX IF NOT EXISTS ix_review_search ON review USING gin (({REVIEW_TSVECTOR}))",
+]
+
+# BM25 column weights for item_fts: name, description, category
+ITEM_WEIGHTS = '10.0, 2.0, 4.0'
+
+
+def _dialect(bind=None):
+    return (bind or db.engine).dialect.name
+
+
+# --- Index Maintenance ---
+@event.listens_for(db.metadata, 'after_create')
+def install(target=None, connection=None, **kw):
+    """Create the search tables/indexes (and SQLite sync triggers) if missing."""
+    connection = connection or db.session.connection()
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}.get(_dialect(connection), [])
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def uninstall(target, connection, **kw):
+    if _dialect(connection) == 'sqlite':
+        for statement in SQLITE_DROP:
+            connection.execute(text(statement))
+
+
+def rebuild():
+    """Re-index every item and review from the base tables."""
+    install()
+    if _dialect() == 'sqlite':
+        db.session.execute(text("INSERT INTO item_fts(item_fts) VALUES ('rebuild')"))
+        db.session.execute(text("INSERT INTO review_fts(review_fts) VALUES ('rebuild')"))
+        db.session.execute(text("INSERT INTO item_fts(item_fts) VALUES ('optimize')"))
+        db.session.execute(text("INSERT INTO review_fts(review_fts) VALUES ('optimize')"))
+    elif _dialect() == 'postgresql':
+        db.session.execute(text('REINDEX INDEX ix_item_search'))
+        db.session.execute(text('REINDEX INDEX ix_review_search'))
+    db.session.commit()
+
+
+# --- Query Parsing ---
+def _terms(query):
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def _fts5_query(terms):
+    # Every term must match; each one also matches as a prefix ("samo" -> samosa)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+# --- Searching ---
+class Results:
+    # One page of ranked hits, shaped like the Pagination objects templates already use
+    def __init__(self, items, total, page, per_page):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+
+    @property
+    def pages(self):
+        return math.ceil(self.total / self.per_page) if self.total else 0
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+
+def _ranked_ids(kind, terms, limit, offset):
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        table = 'item_fts' if kind == 'item' else 'review_fts'
+        rank = f'bm25(item_fts, {ITEM_WEIGHTS})' if kind == 'item' else 'bm25(review_fts)'
+        params = {'q': _fts5_query(terms), 'limit': limit, 'offset': offset}
+        rows = db.session.execute(text(
+            f'SELECT rowid, {rank} AS score FROM {table} WHERE {table} MATCH :q '
+            f'ORDER BY score LIMIT :limit OFFSET :offset'), params).all()
+        total = db.session.execute(text(f'SELECT count(*) FROM {table} WHERE {table} MATCH :q'), params).scalar()
+    elif dialect == 'postgresql':
+        # Postgres has no BM25; ts_rank_cd (cover density) is the closest built-in
+        table, vector = ('item', ITEM_TSVECTOR) if kind == 'item' else ('review', REVIEW_TSVECTOR)
+        params = {'q': _tsquery(terms), 'limit': limit, 'offset': offset}
+        match = f"{vector} @@ to_tsquery('english', :q)"
+        rows = db.session.execute(text(
+            f"SELECT id, -ts_rank_cd({vector}, to_tsquery('english', :q)) AS score FROM {table} "
+            f'WHERE {match} ORDER BY score LIMIT :limit OFFSET :offset'), params).all()
+        total = db.session.execute(text(f'SELECT count(*) FROM {table} WHERE {match}'), params).scalar()
+    else:
+        # No full-text support: substring match, unranked
+        model, column = (Item, Item.name) if kind == 'item' else (Review, Review.text)
+        query = db.session.query(model.id)
+        for term in terms:
+            query = query.filter(column.ilike(f'%{term}%'))
+        total = query.count()
+        rows = [(row_id, 0.0) for row_id, in query.order_by(model.id).limit(limit).offset(offset)]
+    return [row[0] for row in rows], total
+
+
+def _search(kind, query, page, per_page):
+    terms = _terms(query or '')
+    if not terms:
+        return Results([], 0, page, per_page)
+    ids, total = _ranked_ids(kind, terms, per_page, (page - 1) * per_page)
+    if kind == 'item':
+        rows = Item.query.filter(Item.id.in_(ids)).all() if ids else []
+    else:
+        rows = (Review.query.options(joinedload(Review.author), joinedload(Review.item))
+                .filter(Review.id.in_(ids)).all()) if ids else []
+    by_id = {row.id: row for row in rows}
+    return Results([by_id[i] for i in ids if i in by_id], total, page, per_page)
+
+
+def search_items(query, page=1, per_page=10):
+    return _search('item', query, page, per_page)
+
+
+def search_reviews(query, page=1, per_page=10):
+    return _search('review', query, page, per_page)
+
+
+def filter_items(items_query, query):
+    """Restrict an Item query to full-text matches, keeping its own ordering."""
+    terms = _terms(query)
+    if not terms:
+        return items_query
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        matches = text('SELECT rowid FROM item_fts WHERE item_fts MATCH :q').bindparams(q=_fts5_query(terms))
+        return items_query.filter(Item.id.in_(matches.columns(rowid=db.Integer)))
+    if dialect == 'postgresql':
+        return items_query.filter(text(f"{ITEM_TSVECTOR} @@ to_tsquery('english', :q)").bindparams(q=_tsquery(terms)))
+    for term in terms:
+        items_query = items_query.filter(Item.name.ilike(f'%{term}%'))
+    return items_query
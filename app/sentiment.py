@@ -0,0 +1,98 @@
+# app/sentiment.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+from importlib.metadata import version
+from sqlalchemy import bindparam
+from textblob import TextBlob
+from app import db, cache, tasks, metrics
+from app.models import Item, Review
+
+# Stored in Review.sentiment_version next to every score, so a change of
+# analyzer (or of TextBlob itself) can be found and re-scored later.
+ANALYZER_VERSION = f"textblob-{version('textblob')}"
+
+MEMO_SIZE = 100000
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _text_key(text):
+    # Short reviews ("good", "Good!") repeat a lot, so normalise before hashing
+    return hashlib.blake2b(' '.join(text.lower().split()).encode('utf-8'), digest_size=16).digest()
+
+
+def polarity(text):
+    # Module-level so it can be shipped to the process pool
+    return TextBlob(text).sentiment.polarity
+
+
+def analyze_batch(texts):
+    """Score a list of texts, returning polarities in the same order.
+
+    Texts seen before are answered from an in-process memo keyed by a hash of
+    the normalised text; the rest are deduplicated and scored on the pool.
+    """
+    keys = [_text_key(text) for text in texts]
+    scores = {}
+    with _memo_lock:
+        for key in keys:
+            if key in _memo:
+                _memo.move_to_end(key)
+                scores[key] = _memo[key]
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in scores:
+            missing.setdefault(key, text)
+    if missing:
+        with metrics.timer('textblob'):
+            computed = tasks.map(polarity, list(missing.values()), chunksize=64)
+        with _memo_lock:
+            for key, score in zip(missing, computed):
+                scores[key] = _memo[key] = score
+            while len(_memo) > MEMO_SIZE:
+                _memo.popitem(last=False)
+    return [scores[key] for key in keys]
+
+
+def analyze(text):
+    return analyze_batch([text])[0]
+
+
+# --- Re-scoring ---
+def rescore_chunk(rows):
+    """Re-score (id, item_id, text, sentiment) review rows and store the results.
+
+    The difference between old and new scores is folded into each item's
+    running sentiment totals, so no aggregate rebuild is needed afterwards.
+    Returns the number of reviews updated.
+    """
+    scores = analyze_batch([row.text for row in rows])
+    # Guarded like app.ingest: a review deleted, or scored by the review job,
+    # since it was read matches no row and its item's totals are left alone.
+    reviews = Review.__table__
+    guarded = reviews.update().where(
+        reviews.c.id == bindparam('b_id'),
+        reviews.c.sentiment.is_not_distinct_from(bindparam('b_old')),
+    ).values(sentiment=bindparam('b_score'), sentiment_version=ANALYZER_VERSION)
+    deltas = {}
+    updated = 0
+    for row, score in zip(rows, scores):
+        matched = db.session.execute(guarded, {'b_id': row.id, 'b_old': row.sentiment, 'b_score': score}).rowcount
+        if not matched:
+            continue
+        updated += 1
+        delta = deltas.setdefault(row.item_id, {'b_id': row.item_id, 'b_sum': 0.0, 'b_count': 0})
+        delta['b_sum'] += score - (row.sentiment or 0.0)
+        delta['b_count'] += 0 if row.sentiment is not None else 1
+    if deltas:
+        items = Item.__table__
+        db.session.execute(
+            items.update().where(items.c.id == bindparam('b_id')).values(
+                sentiment_sum=items.c.sentiment_sum + bindparam('b_sum'),
+                sentiment_count=items.c.sentiment_count + bindparam('b_count')),
+            list(deltas.values()))
+    db.session.commit()
+    cache.invalidate(*(f'item:{item_id}' for item_id in deltas), 'reviews')
+    return updated
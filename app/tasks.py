@@ -0,0 +1,264 @@
+# app/tasks.py
+
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+# --- Job Stores ---
+class MemoryJobStore:
+    # Jobs live in this process only and are lost on restart
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._heap = [] # (available_at, seq, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def put(self, kind, payload):
+        with self._cond:
+            if len(self._heap) >= self.maxsize:
+                raise QueueFull(kind)
+            job = {'id': next(self._seq), 'kind': kind, 'payload': payload, 'attempts': 0}
+            heapq.heappush(self._heap, (time.time(), job['id'], job))
+            self._cond.notify()
+
+    def claim(self, limit, timeout):
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    jobs = []
+                    while self._heap and self._heap[0][0] <= now and len(jobs) < limit:
+                        jobs.append(heapq.heappop(self._heap)[2])
+                    return jobs
+                if now >= deadline:
+                    return []
+                wait = deadline - now
+                if self._heap:
+                    wait = min(wait, self._heap[0][0] - now)
+                self._cond.wait(wait)
+
+    def ack(self, jobs):
+        pass
+
+    def retry(self, job, delay):
+        with self._cond:
+            job['attempts'] += 1
+            heapq.heappush(self._heap, (time.time() + delay, next(self._seq), job))
+            self._cond.notify()
+
+    def depth(self):
+        return len(self._heap)
+
+
+class SqliteJobStore:
+    # Durable queue in its own SQLite file, shared by every worker process.
+    # A claimed job that is never acked (the worker died) becomes visible
+    # again after `visibility_timeout` seconds.
+    def __init__(self, path, maxsize, visibility_timeout=300):
+        self.path = path
+        self.maxsize = maxsize
+        self.visibility_timeout = visibility_timeout
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        with self._connect() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS job (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                claimed_at REAL
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_job_available ON job (available_at)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def put(self, kind, payload):
+        conn = self._connect()
+        if self.depth() >= self.maxsize:
+            raise QueueFull(kind)
+        conn.execute('INSERT INTO job (kind, payload, available_at) VALUES (?, ?, ?)',
+                     (kind, json.dumps(payload), time.time()))
+        self._wakeup.set()
+
+    def claim(self, limit, timeout):
+        deadline = time.time() + timeout
+        conn = self._connect()
+        while True:
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute(
+                    'SELECT id, kind, payload, attempts FROM job WHERE available_at <= ? '
+                    'AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY id LIMIT ?',
+                    (now, now - self.visibility_timeout, limit)).fetchall()
+                if rows:
+                    conn.executemany('UPDATE job SET claimed_at = ? WHERE id = ?', [(now, row[0]) for row in rows])
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            if rows:
+                return [{'id': id, 'kind': kind, 'payload': json.loads(payload), 'attempts': attempts}
+                        for id, kind, payload, attempts in rows]
+            if now >= deadline:
+                return []
+            # Jobs put by other processes are found by polling
+            self._wakeup.wait(min(0.5, deadline - now))
+            self._wakeup.clear()
+
+    def ack(self, jobs):
+        self._connect().executemany('DELETE FROM job WHERE id = ?', [(job['id'],) for job in jobs])
+
+    def retry(self, job, delay):
+        self._connect().execute(
+            'UPDATE job SET attempts = attempts + 1, available_at = ?, claimed_at = NULL WHERE id = ?',
+            (time.time() + delay, job['id']))
+
+    def depth(self):
+        return self._connect().execute('SELECT COUNT(*) FROM job').fetchone()[0]
+
+
+# --- Task Queue Extension ---
+class TaskQueue:
+    """Background job queue drained in batches by a dispatcher thread.
+
+    Handlers are registered per job kind and receive a list of payloads.
+    CPU-heavy steps inside a handler go through `map`, which fans out over a
+    local process pool. With TASKS_ASYNC off (tests, seeding) jobs run inline.
+    When the queue is full, the job also runs inline in the request. That
+    slows the producer down instead of dropping work.
+    """
+
+    def __init__(self, app=None):
+        self.handlers = {}
+        self.store = None
+        self.async_mode = False
+        self._app = None
+        self._pool = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.counters = {'enqueued': 0, 'processed': 0, 'retried': 0, 'failed': 0, 'inline': 0, 'batches': 0}
+        self.last_batch_seconds = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        self.async_mode = app.config.get('TASKS_ASYNC', True)
+        self.workers = app.config.get('TASK_WORKERS', 2)
+        self.batch_size = app.config.get('TASK_BATCH_SIZE', 32)
+        self.max_retries = app.config.get('TASK_MAX_RETRIES', 3)
+        maxsize = app.config.get('TASK_QUEUE_MAXSIZE', 1000)
+        path = app.config.get('TASK_QUEUE_PATH')
+        self.store = SqliteJobStore(path, maxsize) if path else MemoryJobStore(maxsize)
+        app.extensions['tasks'] = self
+        if self.async_mode and path:
+            # Pick up jobs left over from before a restart. Started lazily so
+            # the thread is created inside each forked server worker.
+            app.before_request(self._ensure_started)
+
+    def handler(self, kind):
+        def decorator(fn):
+            self.handlers[kind] = fn
+            return fn
+        return decorator
+
+    # --- Producer side ---
+    def enqueue(self, kind, payload):
+        if not self.async_mode:
+            self._run_inline(kind, payload)
+            return
+        try:
+            self.store.put(kind, payload)
+        except QueueFull:
+            log.warning('Task queue full, running %s job inline', kind)
+            self.counters['inline'] += 1
+            self._run_inline(kind, payload)
+            return
+        self.counters['enqueued'] += 1
+        self._ensure_started()
+
+    def _run_inline(self, kind, payload):
+        self.handlers[kind]([payload])
+        self.counters['processed'] += 1
+
+    def map(self, fn, iterable, chunksize=1):
+        """Run `fn` over `iterable` in the process pool (or inline when synchronous)."""
+        if not self.async_mode:
+            return list(map(fn, iterable))
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # 'spawn' because the dispatcher thread is already running
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return list(self._pool.map(fn, iterable, chunksize=chunksize))
+
+    # --- Consumer side ---
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='task-dispatcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                jobs = self.store.claim(self.batch_size, timeout=5)
+            except Exception:
+                log.exception('Could not claim jobs')
+                time.sleep(1)
+                continue
+            if jobs:
+                self.process(jobs)
+
+    def process(self, jobs):
+        started = time.perf_counter()
+        by_kind = {}
+        for job in jobs:
+            by_kind.setdefault(job['kind'], []).append(job)
+        for kind, batch in by_kind.items():
+            try:
+                with self._app.app_context():
+                    self.handlers[kind]([job['payload'] for job in batch])
+            except Exception:
+                log.exception('%s batch of %d failed', kind, len(batch))
+                for job in batch:
+                    if job['attempts'] + 1 >= self.max_retries:
+                        log.error('Giving up on %s job %s after %d attempts', kind, job['id'], job['attempts'] + 1)
+                        self.counters['failed'] += 1
+                        self.store.ack([job])
+                    else:
+                        self.counters['retried'] += 1
+                        self.store.retry(job, delay=2 ** job['attempts'])
+            else:
+                self.counters['processed'] += len(batch)
+                self.store.ack(batch)
+        self.counters['batches'] += 1
+        self.last_batch_seconds = round(time.perf_counter() - started, 4)
+
+    def stats(self):
+        return dict(self.counters, depth=self.store.depth(), async_mode=self.async_mode,
+                    last_batch_seconds=self.last_batch_seconds)
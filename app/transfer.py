@@ -0,0 +1,258 @@
+# app/transfer.py
+
+import csv
+import io
+import time
+from datetime import datetime
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, cast, func, insert, select, update
+from app import db, cache, sentiment, leaderboards
+from app.models import User, Item, Review, favorites, rebuild_item_aggregates
+
+FORMATS = ('csv', 'parquet')
+# Rows fetched per round trip while exporting; memory stays at one batch
+YIELD_PER = 2000
+
+
+# --- Export ---
+# Items and users are exported by name as well as id, so a file can be
+# imported into another database where the ids differ.
+def _avg(total, count):
+    return cast(func.coalesce(total * 1.0 / func.nullif(count, 0), 0), Numeric(4, 2))
+
+
+EXPORTS = {
+    'items': lambda: select(
+        Item.id, Item.name, Item.category, Item.description, Item.image_url,
+        _avg(Item.rating_sum, Item.rating_count).label('avg_rating'), Item.rating_count.label('review_count'),
+    ).order_by(Item.id),
+    'reviews': lambda: select(
+        Review.id, Item.name.label('item_name'), User.username, Review.rating, Review.text,
+        Review.sentiment, Review.date_posted,
+    ).join(Item, Item.id == Review.item_id).join(User, User.id == Review.user_id).order_by(Review.id),
+    'favorites': lambda: select(
+        User.username, Item.name.label('item_name'),
+    ).select_from(favorites).join(User, User.id == favorites.c.user_id)
+     .join(Item, Item.id == favorites.c.item_id).order_by(favorites.c.user_id, favorites.c.item_id),
+}
+
+
+def export_rows(kind):
+    """(column names, iterator of row tuples) for one export, streamed with a server-side cursor."""
+    result = db.session.execute(EXPORTS[kind]().execution_options(yield_per=YIELD_PER))
+    return list(result.keys()), (tuple(row) for row in result)
+
+
+def csv_chunks(kind):
+    """The export as CSV text, one chunk per YIELD_PER rows, for a streaming response."""
+    columns, rows = export_rows(kind)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _arrow_schema(statement):
+    """The Parquet schema for an export, from its column types rather than its first rows."""
+    import pyarrow as pa
+
+    def arrow_type(sql_type):
+        # Float before Numeric: it's a subclass
+        if isinstance(sql_type, Boolean):
+            return pa.bool_()
+        if isinstance(sql_type, Integer):
+            return pa.int64()
+        if isinstance(sql_type, Float):
+            return pa.float64()
+        if isinstance(sql_type, Numeric):
+            return pa.decimal128(sql_type.precision or 38, sql_type.scale if sql_type.scale is not None else 10)
+        if isinstance(sql_type, DateTime):
+            return pa.timestamp('us')
+        if isinstance(sql_type, Date):
+            return pa.date32()
+        return pa.string()
+
+    return pa.schema([(column.key, arrow_type(column.type)) for column in statement.selected_columns])
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export(kind, path, fmt='csv'):
+    """Write an export to `path`; returns the number of rows."""
+    columns, rows = export_rows(kind)
+    count = 0
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # Typed up front, so an all-NULL batch or an empty export still gets the real schema
+        schema = _arrow_schema(EXPORTS[kind]())
+        with pq.ParquetWriter(path, schema) as writer:
+            # One row group per batch, so only a batch is ever held in memory
+            for batch in _batches(rows, YIELD_PER):
+                writer.write_table(pa.Table.from_pylist([dict(zip(columns, row)) for row in batch], schema=schema))
+                count += len(batch)
+        return count
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+# --- Import ---
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = []  # (row number, reason), first few only
+        self.skipped_count = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def skip(self, number, reason):
+        self.skipped_count += 1
+        if len(self.skipped) < 20:
+            self.skipped.append((number, reason))
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        return (self.inserted + self.updated) / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(path, fmt=None):
+    """Yield each row of a CSV or Parquet file as a dict."""
+    fmt = fmt or ('parquet' if path.endswith('.parquet') else 'csv')
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=YIELD_PER):
+            yield from batch.to_pylist()
+        return
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def _text(row, key):
+    value = row.get(key)
+    return value.strip() if isinstance(value, str) else value
+
+
+def import_items(rows, batch_size=1000):
+    """Insert menu items, or update the existing item with the same name."""
+    report = ImportReport()
+    updated_ids = []
+    for batch in _batches(enumerate(rows, start=1), batch_size):
+        values = {}
+        for number, row in batch:
+            name, category = _text(row, 'name'), _text(row, 'category')
+            if not name or not category:
+                report.skip(number, 'name and category are required')
+                continue
+            # A later row with the same name wins, as it would row by row
+            values[name] = {'name': name, 'category': category}
+            # Blank optional columns leave an existing item's value alone
+            for column in ('description', 'image_url'):
+                if _text(row, column):
+                    values[name][column] = _text(row, column)
+        existing = {name: item_id for item_id, name in
+                    db.session.execute(select(Item.id, Item.name).where(Item.name.in_(values)))}
+        updates = [dict(v, id=existing[name]) for name, v in values.items() if name in existing]
+        inserts = [v for name, v in values.items() if name not in existing]
+        # Separate statements per key set: executemany needs the same columns in every row
+        for group in _group_by_keys(updates):
+            db.session.execute(update(Item), group)
+        for group in _group_by_keys(inserts):
+            db.session.execute(insert(Item), group)
+        db.session.commit()
+        report.updated += len(updates)
+        report.inserted += len(inserts)
+        updated_ids.extend(row['id'] for row in updates)
+    # Item cards and /api/v1/items/<id> hang off the per-item namespaces
+    cache.invalidate('items', 'reviews', *(f'item:{item_id}' for item_id in updated_ids))
+    return report.finish()
+
+
+def _group_by_keys(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return list(groups.values())
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value) if value else datetime.utcnow()
+
+
+def import_reviews(rows, batch_size=1000, rebuild=True):
+    """Insert historical reviews, matched to items by name and authors by username.
+
+    Each batch's unscored rows are scored in one analyze_batch call and the
+    batch is inserted with one executemany. The item aggregates, leaderboards
+    and per-user counters are rebuilt at the end.
+    """
+    report = ImportReport()
+    item_ids = dict(db.session.execute(select(Item.name, Item.id)).all())
+    user_ids = {}
+    touched_items = set()
+    for batch in _batches(enumerate(rows, start=1), batch_size):
+        wanted = {_text(row, 'username') for _, row in batch} - user_ids.keys()
+        if wanted:
+            user_ids.update(db.session.execute(select(User.username, User.id).where(User.username.in_(wanted))).all())
+        values = []
+        for number, row in batch:
+            item_id, user_id = item_ids.get(_text(row, 'item_name')), user_ids.get(_text(row, 'username'))
+            text = _text(row, 'text')
+            score = row.get('sentiment')
+            try:
+                rating = int(row.get('rating') or 0)
+                posted = _parse_date(row.get('date_posted'))
+                score = float(score) if score not in (None, '') else None
+            except (TypeError, ValueError):
+                report.skip(number, 'bad rating, date_posted or sentiment')
+                continue
+            if item_id is None or user_id is None:
+                report.skip(number, f"unknown {'item' if item_id is None else 'user'}")
+                continue
+            if not 1 <= rating <= 5 or not text:
+                report.skip(number, 'rating must be 1-5 and text non-empty')
+                continue
+            # Scores carried in the file keep no analyzer version, so `flask sentiment rescore` redoes them
+            values.append({'item_id': item_id, 'user_id': user_id, 'rating': rating, 'text': text,
+                           'date_posted': posted, 'sentiment': score, 'sentiment_version': None})
+        to_score = [v for v in values if v['sentiment'] is None]
+        for v, score in zip(to_score, sentiment.analyze_batch([v['text'] for v in to_score])):
+            v['sentiment'] = score
+            v['sentiment_version'] = sentiment.ANALYZER_VERSION
+        if values:
+            db.session.execute(insert(Review), values)
+            db.session.commit()
+        touched_items.update(v['item_id'] for v in values)
+        report.inserted += len(values)
+    report.finish()
+    if rebuild and touched_items:
+        rebuild_item_aggregates(touched_items)
+        leaderboards.rebuild()
+    cache.invalidate('reviews', 'users', *(f'item:{item_id}' for item_id in touched_items),
+                     *(f'user:{user_id}' for user_id in user_ids.values()))
+    return report
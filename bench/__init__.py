@@ -0,0 +1,2 @@
+# bench/__init__.py
+# Synthetic data generation and load testing; run the modules with `python -m bench.<name>`.
@@ -0,0 +1,129 @@
+# bench/concurrency.py
+"""Measure write contention with several worker processes sharing one SQLite file.
+
+    DATABASE_URL=sqlite:///bench.db python -m bench.concurrency --workers 4 --seconds 15
+
+Each process stands in for a gunicorn worker: it builds its own app, logs in
+as a different user and mixes page views with review POSTs and favorite
+toggles. The run is repeated with SQLite's defaults (rollback journal,
+synchronous=FULL) and with the WAL settings from app/database.py, so the
+"database is locked" errors and the write-latency tail can be compared.
+Run it on a machine with at least as many cores as workers; on fewer, the
+processes mostly wait on the CPU rather than on each other.
+"""
+import json
+import logging
+import multiprocessing
+import random
+import sqlite3
+import time
+import click
+from config import Config
+from app import create_app, db
+from bench.datagen import PASSWORD
+from bench.loadtest import _percentile
+
+MODES = ('baseline', 'tuned')
+
+
+def _worker(mode, worker_id, seconds, write_ratio, barrier, results):
+    class WorkerConfig(Config):
+        SQLITE_TUNING = mode == 'tuned'
+        # Score reviews and check passwords inline; a process pool per worker would only add noise
+        TASKS_ASYNC = False
+        PASSWORD_HASH_WORKERS = 0
+    app = create_app(WorkerConfig)
+    app.config['WTF_CSRF_ENABLED'] = False
+    # Failed requests are counted below; their tracebacks would drown the report
+    app.logger.setLevel(logging.CRITICAL)
+    with app.app_context():
+        item_ids = [row[0] for row in db.session.execute(db.text('SELECT id FROM item'))]
+        db.session.remove()
+    client = app.test_client()
+    client.post('/login', data={'username': f'user{worker_id + 2}', 'password': PASSWORD})
+    rng = random.Random(worker_id)
+    samples = []
+    barrier.wait()
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        item_id = rng.choice(item_ids)
+        if rng.random() < write_ratio:
+            if rng.random() < 0.5:
+                kind, args = 'write', (f'/item/{item_id}', 'POST', {'rating': rng.randint(1, 5),
+                                                                     'text': f'Concurrency test review {rng.random()}'})
+            else:
+                action = rng.choice(['favorite', 'unfavorite'])
+                kind, args = 'write', (f'/{action}/{item_id}', 'POST', None)
+        else:
+            kind, args = 'read', (rng.choice(['/menu', f'/item/{item_id}']), 'GET', None)
+        path, method, data = args
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = time.perf_counter() - started
+        samples.append((kind, elapsed * 1000, response.status_code < 500))
+    results.put(samples)
+
+
+def _set_journal_mode(path, mode):
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA journal_mode={mode}')
+    conn.close()
+
+
+def run(mode, path, workers, seconds, write_ratio):
+    # journal_mode is stored in the database file, so put it back explicitly
+    _set_journal_mode(path, 'WAL' if mode == 'tuned' else 'DELETE')
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker, args=(mode, i, seconds, write_ratio, barrier, results))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    samples = [sample for _ in processes for sample in results.get()]
+    for process in processes:
+        process.join()
+
+    summary = {}
+    for kind in ('read', 'write'):
+        latencies = sorted(ms for k, ms, ok in samples if k == kind)
+        errors = sum(1 for k, ms, ok in samples if k == kind and not ok)
+        summary[kind] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput_rps': round(len(latencies) / seconds, 1),
+            'latency_ms': {p: round(_percentile(latencies, int(p[1:])), 2) if latencies else None
+                           for p in ('p50', 'p95', 'p99')},
+        }
+    return summary
+
+
+@click.command()
+@click.option('--workers', default=4, show_default=True, help='Worker processes sharing the database.')
+@click.option('--seconds', default=10, show_default=True)
+@click.option('--write-ratio', default=0.3, show_default=True)
+@click.option('--mode', 'modes', multiple=True, type=click.Choice(MODES), help='Run only this mode (repeatable).')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Write the results to this JSON file.')
+def concurrency(workers, seconds, write_ratio, modes, output):
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            raise click.UsageError('This benchmark compares SQLite settings; DATABASE_URL must be a SQLite file.')
+        path = db.engine.url.database
+    results = {'workers': workers, 'seconds': seconds, 'write_ratio': write_ratio, 'modes': {}}
+    click.echo(f"{'mode':<10}{'kind':<7}{'req':>7}{'err':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for mode in modes or MODES:
+        summary = results['modes'][mode] = run(mode, path, workers, seconds, write_ratio)
+        for kind, r in summary.items():
+            latency = r['latency_ms']
+            click.echo(f"{mode:<10}{kind:<7}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>8}"
+                       f"{latency['p50']!s:>9}{latency['p95']!s:>9}{latency['p99']!s:>9}")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        click.echo(f'Results written to {output}.')
+
+
+if __name__ == '__main__':
+    concurrency()
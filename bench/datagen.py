@@ -0,0 +1,176 @@
+# bench/datagen.py
+"""Fill the database with a large synthetic dataset for load testing.
+
+    DATABASE_URL=sqlite:///bench.db python -m bench.datagen --users 100000 --items 2000 --reviews 5000000
+
+Like seed.py this drops and recreates every table. Rows go in through
+batched Core inserts rather than session.add, and the distributions are
+skewed the way real traffic is: a few items and users account for most
+reviews, reviews cluster around meal times and recent days, and ratings
+lean on a per-item quality score.
+"""
+import time
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from sqlalchemy import insert, text
+from app import create_app, db, passwords, leaderboards, sentiment, recommendations
+from app.models import User, Item, Review, favorites, rebuild_item_aggregates
+from flask_migrate import stamp
+
+# Every generated user logs in with this password (see bench.loadtest)
+PASSWORD = 'password'
+
+CATEGORIES = ['Breakfast', 'Lunch', 'Snack', 'Beverage', 'Dessert']
+ADJECTIVES = ['Spicy', 'Classic', 'Crispy', 'Masala', 'Cheesy', 'Grilled', 'Tandoori', 'Sweet', 'Mini', 'Jumbo',
+              'Butter', 'Garlic', 'Herb', 'Smoky', 'Tangy', 'Loaded', 'Veg', 'Chicken', 'Paneer', 'Mango']
+DISHES = ['Samosa', 'Dosa', 'Biryani', 'Sandwich', 'Wrap', 'Noodles', 'Fried Rice', 'Pav Bhaji', 'Idli', 'Vada',
+          'Burger', 'Pizza', 'Pasta', 'Momos', 'Roll', 'Poha', 'Upma', 'Paratha', 'Lassi', 'Cold Coffee',
+          'Tea', 'Juice', 'Shake', 'Brownie', 'Kulfi', 'Gulab Jamun', 'Puff', 'Cutlet', 'Chaat', 'Thali']
+
+# Review text is assembled from these, so the pool of distinct texts is small
+# and is scored once up front instead of per review.
+OPENINGS = {
+    1: ['Terrible.', 'Really disappointing.', 'Would not order this again.', 'Awful experience.'],
+    2: ['Not great.', 'Pretty bland today.', 'Below average.', 'A bit of a letdown.'],
+    3: ['It was okay.', 'Average, nothing special.', 'Decent for the price.', 'Fine but forgettable.'],
+    4: ['Really good!', 'Tasty and filling.', 'Nice portion size.', 'Would order again.'],
+    5: ['Absolutely delicious!', 'The best on campus!', 'Amazing, loved it.', 'Perfect every time!'],
+}
+CLOSINGS = ['The queue was long.', 'Served hot and fresh.', 'A little too oily.', 'Great value for money.',
+            'Staff were friendly.', 'Could use more spice.', 'Came quickly at lunch.', 'Portion was small.']
+
+# Relative traffic by hour of day: breakfast, lunch and evening snack peaks
+HOUR_WEIGHTS = np.array([1, 1, 1, 1, 1, 2, 4, 10, 14, 9, 6, 8, 18, 20, 12, 6, 8, 12, 9, 6, 4, 3, 2, 1], dtype=float)
+
+
+def _item_names(count):
+    combos = [f'{adjective} {dish}' for dish in DISHES for adjective in ADJECTIVES]
+    return [combos[i] if i < len(combos) else f'{combos[i % len(combos)]} {i // len(combos) + 1}'
+            for i in range(count)]
+
+
+def _zipf_weights(count, exponent, rng):
+    # Popularity by rank, shuffled so the popular rows aren't simply the lowest ids
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def _insert_batches(table, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(table), rows[start:start + batch_size])
+        db.session.commit()
+
+
+def _report(label, count, started):
+    elapsed = time.perf_counter() - started
+    click.echo(f'--> {count:,} {label} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)')
+
+
+@click.command()
+@click.option('--users', default=100000, show_default=True)
+@click.option('--items', default=2000, show_default=True)
+@click.option('--reviews', default=5000000, show_default=True)
+@click.option('--favorites-per-user', default=3.0, show_default=True, help='Mean favorites per user.')
+@click.option('--days', default=365, show_default=True, help='How far back review dates go.')
+@click.option('--batch-size', default=20000, show_default=True)
+@click.option('--seed', default=42, show_default=True)
+@click.option('--skip-derived', is_flag=True, help="Don't rebuild the leaderboards or recommendations.")
+def generate(users, items, reviews, favorites_per_user, days, batch_size, seed, skip_derived):
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+
+    click.echo('--> Dropping all tables and recreating...')
+    db.drop_all()
+    db.create_all()
+    stamp()
+    if db.engine.dialect.name == 'sqlite':
+        # Losing the file in a crash mid-load is fine; waiting on fsync per batch is not
+        db.session.execute(text('PRAGMA synchronous=OFF'))
+
+    # --- Users ---
+    started = time.perf_counter()
+    # Full cost, so the login scenario measures what production pays
+    password = passwords.hash(PASSWORD)
+    user_rows = [{'id': 1, 'username': 'admin', 'password': password, 'is_admin': True}]
+    user_rows += [{'id': i, 'username': f'user{i}', 'password': password, 'is_admin': False}
+                  for i in range(2, users + 1)]
+    _insert_batches(User, user_rows, batch_size)
+    _report('users', users, started)
+
+    # --- Items ---
+    started = time.perf_counter()
+    categories = rng.choice(len(CATEGORIES), items)
+    item_rows = [{'id': i + 1, 'name': name, 'category': CATEGORIES[categories[i]],
+                  'description': f'A canteen favourite: {name.lower()}.'}
+                 for i, name in enumerate(_item_names(items))]
+    _insert_batches(Item, item_rows, batch_size)
+    _report('items', items, started)
+
+    item_p = _zipf_weights(items, 1.1, rng)
+    user_p = rng.lognormal(0.0, 1.2, users)
+    user_p /= user_p.sum()
+    quality = np.clip(rng.normal(3.7, 0.6, items), 1.5, 4.8)
+
+    # --- Reviews ---
+    texts = {rating: [f'{opening} {closing}' for opening in OPENINGS[rating] for closing in CLOSINGS]
+             for rating in OPENINGS}
+    all_texts = [t for rating in sorted(texts) for t in texts[rating]]
+    scores = dict(zip(all_texts, sentiment.analyze_batch(all_texts)))
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    hour_p = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+
+    started = time.perf_counter()
+    with click.progressbar(length=reviews, label='--> Reviews') as bar:
+        for start in range(0, reviews, batch_size):
+            size = min(batch_size, reviews - start)
+            item_idx = rng.choice(items, size, p=item_p)
+            user_idx = rng.choice(users, size, p=user_p)
+            ratings = np.clip(np.rint(rng.normal(quality[item_idx], 1.0)), 1, 5).astype(int)
+            # Recent days are busier than old ones
+            day_offsets = np.minimum(rng.exponential(days / 4, size), days - 1).astype(int)
+            hours = rng.choice(24, size, p=hour_p)
+            seconds = rng.integers(0, 3600, size)
+            text_idx = rng.integers(0, len(OPENINGS[1]) * len(CLOSINGS), size)
+            rows = []
+            for i in range(size):
+                posted = today - timedelta(days=int(day_offsets[i])) + timedelta(hours=int(hours[i]), seconds=int(seconds[i]))
+                review_text = texts[ratings[i]][text_idx[i]]
+                rows.append({'rating': int(ratings[i]), 'text': review_text, 'date_posted': min(posted, now),
+                             'user_id': int(user_idx[i]) + 1, 'item_id': int(item_idx[i]) + 1,
+                             'sentiment': scores[review_text], 'sentiment_version': sentiment.ANALYZER_VERSION})
+            db.session.execute(insert(Review), rows)
+            db.session.commit()
+            bar.update(size)
+    _report('reviews', reviews, started)
+
+    # --- Favorites ---
+    started = time.perf_counter()
+    counts = rng.poisson(favorites_per_user * user_p * users)
+    fav_users = np.repeat(np.arange(users), counts)
+    fav_items = rng.choice(items, len(fav_users), p=item_p)
+    pairs = np.unique(fav_users.astype(np.int64) * items + fav_items)
+    fav_rows = [{'user_id': int(pair // items) + 1, 'item_id': int(pair % items) + 1} for pair in pairs]
+    _insert_batches(favorites, fav_rows, batch_size)
+    _report('favorites', len(fav_rows), started)
+
+    # --- Derived Data ---
+    # The search index needs nothing here: its triggers indexed every row on insert
+    started = time.perf_counter()
+    rebuild_item_aggregates()
+    _report('item aggregates', items, started)
+    if skip_derived:
+        return
+    started = time.perf_counter()
+    buckets = leaderboards.rebuild()
+    _report('review buckets', buckets, started)
+    started = time.perf_counter()
+    recommended = recommendations.rebuild()
+    _report('users with recommendations', recommended, started)
+
+
+if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        generate()
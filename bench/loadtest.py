@@ -0,0 +1,297 @@
+# bench/loadtest.py
+"""Drive the app's hot paths and report latency, queries per request and throughput.
+
+    DATABASE_URL=sqlite:///bench.db python -m bench.loadtest --requests 500 --concurrency 4 -o results.json
+    DATABASE_URL=sqlite:///bench.db python -m bench.loadtest --server --compare results.json
+
+Requests go through the Flask test client, or with --server through a local
+threaded WSGI server over real HTTP. Either way the app runs in this process,
+so every response carries the number of SQL statements it ran.
+"""
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookiejar import CookieJar
+import click
+from sqlalchemy import event, func
+from werkzeug.serving import WSGIRequestHandler, make_server
+from app import create_app, db, tasks
+from app.models import User, Item, Review
+from bench.datagen import PASSWORD
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+# --- Query Counting ---
+class QueryCounter:
+    # WSGI middleware: counts the statements each request sends to the engines
+    # (primary and replica, on the thread serving it) and reports them in a
+    # response header.
+    def __init__(self, wsgi_app, engines):
+        self.wsgi_app = wsgi_app
+        self.local = threading.local()
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        if getattr(self.local, 'count', None) is not None:
+            self.local.count += 1
+
+    def __call__(self, environ, start_response):
+        self.local.count = 0
+
+        def counted_start_response(status, headers, exc_info=None):
+            headers.append((QUERY_COUNT_HEADER, str(self.local.count)))
+            return start_response(status, headers, exc_info)
+
+        try:
+            return self.wsgi_app(environ, counted_start_response)
+        finally:
+            self.local.count = None
+
+
+# --- Sessions ---
+class ClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code, response.headers.get(QUERY_COUNT_HEADER)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Time the request itself, not the page it redirects to
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class HttpSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                return response.status, response.headers.get(QUERY_COUNT_HEADER)
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get(QUERY_COUNT_HEADER)
+
+
+# --- Scenarios ---
+# build(rng, fixtures) -> (method, path, form data). `expect` is the status of a
+# successful request; `authenticated` sessions log in before the run starts;
+# `fresh` scenarios get a new, anonymous session for every request.
+Scenario = namedtuple('Scenario', 'build expect authenticated fresh')
+
+SCENARIOS = {
+    'home': Scenario(lambda rng, f: ('GET', '/', None), 200, False, False),
+    'menu': Scenario(lambda rng, f: ('GET', '/menu', None), 200, False, False),
+    'item': Scenario(lambda rng, f: ('GET', f'/item/{f.pick_item(rng)}', None), 200, False, False),
+    'review': Scenario(lambda rng, f: ('POST', f'/item/{f.pick_item(rng)}', {
+        'rating': rng.randint(1, 5), 'text': f'Load test review number {rng.randint(0, 10 ** 9)}.'}), 302, True, False),
+    'login': Scenario(lambda rng, f: ('POST', '/login', {
+        'username': rng.choice(f.usernames), 'password': f.password}), 302, False, True),
+}
+
+
+class Fixtures:
+    # Ids and usernames to draw requests from, read once before the run
+    def __init__(self, password, sample=1000):
+        items = db.session.query(Item.id, Item.rating_count).all()
+        self.item_ids = [item_id for item_id, _ in items]
+        # Busy items get proportionally more traffic
+        self.item_weights = [count + 1 for _, count in items]
+        users = db.session.query(User.username).filter(User.is_admin.is_(False)).order_by(func.random()).limit(sample)
+        self.usernames = [username for username, in users]
+        self.password = password
+
+    def pick_item(self, rng):
+        return rng.choices(self.item_ids, self.item_weights)[0]
+
+
+# --- Running ---
+def _percentile(sorted_values, p):
+    # Nearest-rank percentile
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def _drain_tasks(timeout=120):
+    # Let background jobs from one scenario finish before the next one is timed
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        c = tasks.counters
+        if tasks.store.depth() == 0 and c['processed'] - c['inline'] + c['failed'] >= c['enqueued']:
+            return
+        time.sleep(0.05)
+
+
+def run_scenario(name, scenario, make_session, fixtures, requests, concurrency, warmup, seed):
+    latencies, queries, errors = [], [], 0
+    lock = threading.Lock()
+    rngs = [random.Random(f'{seed}-{name}-{i}') for i in range(concurrency)]
+    sessions = [make_session() for _ in range(concurrency)]
+    if scenario.authenticated:
+        for rng, session in zip(rngs, sessions):
+            session.request('POST', '/login', {'username': rng.choice(fixtures.usernames), 'password': fixtures.password})
+
+    def drive(count, record):
+        remaining = iter(range(count))
+
+        def worker(i):
+            nonlocal errors
+            rng, session = rngs[i], sessions[i]
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                if scenario.fresh:
+                    session = make_session()
+                method, path, data = scenario.build(rng, fixtures)
+                started = time.perf_counter()
+                status, query_count = session.request(method, path, data)
+                elapsed = time.perf_counter() - started
+                if not record:
+                    continue
+                with lock:
+                    latencies.append(elapsed * 1000)
+                    if query_count is not None:
+                        queries.append(int(query_count))
+                    if status != scenario.expect:
+                        errors += 1
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            for future in [pool.submit(worker, i) for i in range(concurrency)]:
+                future.result()
+
+    drive(warmup, record=False)
+    _drain_tasks()
+    started = time.perf_counter()
+    drive(requests, record=True)
+    elapsed = time.perf_counter() - started
+    _drain_tasks()
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(requests / elapsed, 1),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 2),
+            'p50': round(_percentile(latencies, 50), 2),
+            'p95': round(_percentile(latencies, 95), 2),
+            'p99': round(_percentile(latencies, 99), 2),
+            'max': round(latencies[-1], 2),
+        },
+        'queries_per_request': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'max': max(queries, default=None),
+        },
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _print_results(results, baseline=None):
+    click.echo(f"{'scenario':<10}{'req':>7}{'err':>5}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>8}")
+    for name, r in results['scenarios'].items():
+        latency = r['latency_ms']
+        qpr = r['queries_per_request']['mean']
+        click.echo(f"{name:<10}{r['requests']:>7}{r['errors']:>5}{r['throughput_rps']:>9}"
+                   f"{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}{qpr if qpr is not None else '-':>8}")
+        before = (baseline or {}).get('scenarios', {}).get(name)
+        if before:
+            changes = []
+            for key in ('p50', 'p95', 'p99'):
+                old, new = before['latency_ms'][key], latency[key]
+                changes.append(f'{key} {(new - old) / old * 100:+.0f}%' if old else f'{key} n/a')
+            old_qpr = before['queries_per_request']['mean']
+            if old_qpr is not None and qpr is not None:
+                changes.append(f'q/req {qpr - old_qpr:+.1f}')
+            click.echo(f"{'':<10}vs baseline: {', '.join(changes)}")
+
+
+@click.command()
+@click.option('--scenario', 'names', multiple=True, type=click.Choice(list(SCENARIOS)),
+              help='Scenario to run (repeatable); all of them by default.')
+@click.option('--requests', default=200, show_default=True, help='Measured requests per scenario.')
+@click.option('--warmup', default=20, show_default=True, help='Unmeasured requests per scenario.')
+@click.option('--concurrency', default=1, show_default=True)
+@click.option('--server', is_flag=True, help='Go over HTTP to a local threaded WSGI server instead of the test client.')
+@click.option('--password', default=PASSWORD, show_default=True, help='Password shared by the test users.')
+@click.option('--seed', default=0, show_default=True)
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Write the results to this JSON file.')
+@click.option('--compare', type=click.File(), help='Earlier results JSON to compare against.')
+def loadtest(names, requests, warmup, concurrency, server, password, seed, output, compare):
+    app = create_app()
+    # Requests are built by hand, without a CSRF token
+    app.config['WTF_CSRF_ENABLED'] = False
+    # Every session comes from one address and would trip the login limiter
+    app.config['LOGIN_RATE_LIMIT'] = False
+    with app.app_context():
+        app.wsgi_app = QueryCounter(app.wsgi_app, db.engines.values())
+        fixtures = Fixtures(password)
+        counts = {'users': db.session.query(func.count(User.id)).scalar(),
+                  'items': db.session.query(func.count(Item.id)).scalar(),
+                  'reviews': db.session.query(func.count(Review.id)).scalar()}
+        db.session.remove()
+
+    if server:
+        httpd = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{httpd.server_port}'
+        make_session = lambda: HttpSession(base_url)
+    else:
+        make_session = lambda: ClientSession(app)
+
+    results = {
+        'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'driver': 'server' if server else 'client',
+        'database': {'dialect': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0], **counts},
+        'requests': requests,
+        'warmup': warmup,
+        'concurrency': concurrency,
+        'scenarios': {},
+    }
+    try:
+        for name in names or SCENARIOS:
+            results['scenarios'][name] = run_scenario(name, SCENARIOS[name], make_session, fixtures,
+                                                      requests, concurrency, warmup, seed)
+    finally:
+        if server:
+            httpd.shutdown()
+
+    _print_results(results, json.load(compare) if compare else None)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        click.echo(f'Results written to {output}.')
+
+
+if __name__ == '__main__':
+    loadtest()
@@ -9,9 +9,123 @@ class Config:
     # Configure the database URI. We'll use SQLite for simplicity.
     # 'site.db' will be created in the root directory.
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///site.db'
+    # Optional read-only copy of the database that read-heavy pages (home,
+    # menu, profiles) query instead; see app/database.py.
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
     
     # Disable a feature of SQLAlchemy that we don't need, which saves resources
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool for server databases (Postgres, MySQL); per worker process
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800
+
+    # Per-connection SQLite settings: WAL journal, synchronous=NORMAL and a
+    # busy timeout so several gunicorn workers can write without "database
+    # is locked" errors. SQLITE_TUNING=0 leaves SQLite's defaults alone.
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') != '0'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB = 64 * 1024
     
+    # Password hashing (see app/passwords.py). Raising BCRYPT_LOG_ROUNDS is safe:
+    # older hashes are upgraded the next time their user logs in. Checks run in
+    # a pool of PASSWORD_HASH_WORKERS processes (0 = inline) with up to
+    # PASSWORD_HASH_MAX_PENDING waiting; beyond that, logins get a 503.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+    PASSWORD_HASH_TIMEOUT = 10
+
+    # Login/registration attempts allowed per (burst, seconds to refill it);
+    # see app/ratelimit.py. Limits are per worker process.
+    LOGIN_RATE_LIMIT = os.environ.get('LOGIN_RATE_LIMIT', '1') != '0'
+    LOGIN_LIMIT_PER_USERNAME = (5, 60)
+    LOGIN_LIMIT_PER_IP = (20, 60)
+
+    # How long each worker reuses a logged-in user's row (see load_user in
+    # app/models.py). Profile edits and favorite changes apply at once in the
+    # worker that made them; other workers only see them straight away with
+    # CACHE_TYPE = 'redis', otherwise after up to USER_CACHE_TTL seconds.
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+
     # Add this line for the image upload folder
-    UPLOAD_FOLDER = 'app/static/uploads'
\ No newline at end of file
+    UPLOAD_FOLDER = 'app/static/uploads'
+    # Uploads with more pixels than this are rejected before being decoded
+    # (see app/images.py), so a small file can't expand into gigabytes.
+    MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 40_000_000))
+
+    # Static files (see app/assets.py). url_for('static', ...) adds a content
+    # digest to the filename so those URLs can be cached for a year; `flask
+    # assets build` writes the .gz/.br copies served to clients that accept
+    # them. STATIC_SENDFILE hands the file itself to the front proxy:
+    # 'x-sendfile' (Apache, lighttpd) or 'x-accel-redirect' (nginx, with an
+    # internal location at STATIC_ACCEL_PREFIX aliased to app/static/).
+    STATIC_FINGERPRINT = os.environ.get('STATIC_FINGERPRINT', '1') != '0'
+    STATIC_SENDFILE = os.environ.get('STATIC_SENDFILE')
+    STATIC_ACCEL_PREFIX = os.environ.get('STATIC_ACCEL_PREFIX', '/_static/')
+
+    # Response/fragment cache (see app/cache.py): 'memory' for a per-process
+    # LRU, 'redis' for a shared Redis-compatible server, or 'null' to disable.
+    # Only 'redis' carries invalidations to every worker, so the API sends
+    # ETags (and answers 304) only with that backend.
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'memory')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 300))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+
+    # Background jobs (see app/tasks.py). TASK_QUEUE_PATH switches from an
+    # in-memory queue to a durable SQLite one that survives restarts.
+    TASKS_ASYNC = os.environ.get('TASKS_ASYNC', '1') != '0'
+    TASK_WORKERS = int(os.environ.get('TASK_WORKERS', 2))
+    TASK_BATCH_SIZE = 32
+    TASK_MAX_RETRIES = 3
+    TASK_QUEUE_MAXSIZE = int(os.environ.get('TASK_QUEUE_MAXSIZE', 1000))
+    TASK_QUEUE_PATH = os.environ.get('TASK_QUEUE_PATH')
+
+    # Item-item recommender (see app/recommendations.py); the similarity
+    # model is written to the instance folder by `flask recommendations rebuild`,
+    # as e.g. item_similarity.<hash of the database URI>.npz so each database
+    # keeps its own. It is rebuilt automatically once items have been added.
+    RECOMMENDER_MODEL_FILE = 'item_similarity.npz'
+    RECOMMENDATIONS_PER_USER = 10
+
+    # Homepage leaderboards (see app/leaderboards.py). `flask leaderboards refresh
+    # --loop` recomputes them every LEADERBOARD_REFRESH_SECONDS; a page view that
+    # finds them older than LEADERBOARD_MAX_STALENESS recomputes them inline.
+    LEADERBOARD_SIZE = 10
+    LEADERBOARD_REFRESH_SECONDS = int(os.environ.get('LEADERBOARD_REFRESH_SECONDS', 60))
+    LEADERBOARD_MAX_STALENESS = int(os.environ.get('LEADERBOARD_MAX_STALENESS', 300))
+
+    # Daily analytics rollups (see app/analytics.py) behind /admin/trends. `flask
+    # analytics refresh --loop` rolls up new reviews every ANALYTICS_REFRESH_SECONDS
+    # and always redoes the last ANALYTICS_RECENT_DAYS days, so sentiment scored
+    # in the background is picked up; the trends page refreshes inline when the
+    # last run is older than ANALYTICS_MAX_STALENESS.
+    ANALYTICS_RECENT_DAYS = int(os.environ.get('ANALYTICS_RECENT_DAYS', 2))
+    ANALYTICS_REFRESH_SECONDS = int(os.environ.get('ANALYTICS_REFRESH_SECONDS', 3600))
+    ANALYTICS_MAX_STALENESS = int(os.environ.get('ANALYTICS_MAX_STALENESS', 6 * 3600))
+
+    # Per-request instrumentation (see app/instrumentation.py), scraped from
+    # /metrics. SERVER_TIMING_HEADER adds a Server-Timing breakdown (db,
+    # render, textblob, pillow) to every response for the browser devtools.
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '1') != '0'
+    SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', '0') != '0'
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 100))
+    N_PLUS_ONE_THRESHOLD = 5
+
+
+class TestConfig(Config):
+    # For tests and scripted fixtures: a throwaway in-memory database, inline
+    # background work and password hashing, and the cheapest bcrypt cost.
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    DATABASE_REPLICA_URL = None
+    WTF_CSRF_ENABLED = False
+    TASKS_ASYNC = False
+    TASK_QUEUE_PATH = None
+    BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0
+    LOGIN_RATE_LIMIT = False
@@ -0,0 +1,106 @@
+"""denormalized aggregates and derived tables
+
+Adds the running review totals on item and user, the leaderboard,
+recommendation and review-bucket tables, and the full-text search index.
+Existing totals are backfilled here; afterwards run `flask leaderboards
+rebuild` and `flask recommendations rebuild` to fill the derived tables.
+
+Revision ID: 75783a707da0
+Revises: 7248a6e4249f
+Create Date: 2026-10-17 19:18:58.507410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '75783a707da0'
+down_revision = '7248a6e4249f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('leaderboard_entry',
+    sa.Column('board', sa.String(length=20), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('subject_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('board', 'rank')
+    )
+    op.create_table('recommendation',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['item.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'rank')
+    )
+    op.create_table('review_bucket',
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(length=4), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['item.id'], ),
+    sa.PrimaryKeyConstraint('item_id', 'granularity', 'bucket_start')
+    )
+
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('sentiment_sum', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('sentiment_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_pending', sa.Boolean(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('sentiment_version', sa.String(length=32), nullable=True))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('review_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill the running totals from the existing reviews
+    op.execute(
+        'UPDATE item SET '
+        'rating_sum = COALESCE((SELECT SUM(rating) FROM review WHERE review.item_id = item.id), 0), '
+        'rating_count = (SELECT COUNT(*) FROM review WHERE review.item_id = item.id), '
+        'sentiment_sum = COALESCE((SELECT SUM(sentiment) FROM review WHERE review.item_id = item.id), 0), '
+        'sentiment_count = (SELECT COUNT(sentiment) FROM review WHERE review.item_id = item.id)')
+    op.execute('UPDATE "user" SET review_count = (SELECT COUNT(*) FROM review WHERE review.user_id = "user".id)')
+
+    # Full-text search tables/triggers (SQLite) or GIN indexes (Postgres)
+    from app import search
+    search.install(connection=op.get_bind())
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("INSERT INTO item_fts(item_fts) VALUES ('rebuild')")
+        op.execute("INSERT INTO review_fts(review_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    from app import search
+    search.uninstall(None, op.get_bind())
+    for trigger in ('item_fts_insert', 'item_fts_delete', 'item_fts_update',
+                    'review_fts_insert', 'review_fts_delete', 'review_fts_update'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP INDEX IF EXISTS ix_item_search')
+    op.execute('DROP INDEX IF EXISTS ix_review_search')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('review_count')
+
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.drop_column('sentiment_version')
+        batch_op.drop_column('image_pending')
+
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.drop_column('sentiment_count')
+        batch_op.drop_column('sentiment_sum')
+        batch_op.drop_column('rating_count')
+        batch_op.drop_column('rating_sum')
+
+    op.drop_table('review_bucket')
+    op.drop_table('recommendation')
+    op.drop_table('leaderboard_entry')
@@ -0,0 +1,68 @@
+"""hot path indexes
+
+Composite indexes matching the queries the pages actually run:
+- review(item_id | user_id | -, date_posted, id): keyset pagination of
+  an item's reviews, a user's reviews and the admin list, newest first.
+- item(category, name, id): the menu's category filter, its name-ordered
+  pages and the DISTINCT category list, all without touching the table.
+- favorites(item_id, user_id): "who favorited this item" (the primary
+  key only serves the user-first direction).
+- review_bucket(granularity, bucket_start, item_id, review_count): the
+  trending window sums, answered from the index alone.
+- user(review_count, id): the top-reviewers board.
+
+`flask schema check-plans` fails if any page's queries fall back to a
+full table scan.
+
+Revision ID: a3c9e1f4b2d7
+Revises: 75783a707da0
+Create Date: 2026-10-17 19:25:12.104233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1f4b2d7'
+down_revision = '75783a707da0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.create_index('ix_review_item_posted', ['item_id', 'date_posted', 'id'], unique=False)
+        batch_op.create_index('ix_review_user_posted', ['user_id', 'date_posted', 'id'], unique=False)
+        batch_op.create_index('ix_review_posted', ['date_posted', 'id'], unique=False)
+
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.create_index('ix_item_category_name', ['category', 'name', 'id'], unique=False)
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.create_index('ix_favorites_item_user', ['item_id', 'user_id'], unique=False)
+
+    with op.batch_alter_table('review_bucket', schema=None) as batch_op:
+        batch_op.create_index('ix_review_bucket_window', ['granularity', 'bucket_start', 'item_id', 'review_count'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_review_count', ['review_count', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_review_count')
+
+    with op.batch_alter_table('review_bucket', schema=None) as batch_op:
+        batch_op.drop_index('ix_review_bucket_window')
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorites_item_user')
+
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.drop_index('ix_item_category_name')
+
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.drop_index('ix_review_posted')
+        batch_op.drop_index('ix_review_user_posted')
+        batch_op.drop_index('ix_review_item_posted')
@@ -0,0 +1,76 @@
+"""analytics rollups
+
+Daily per-item and per-category review stats (count, rating histogram,
+sentiment totals, distinct reviewers) for the admin trends page, and the
+watermark app.analytics keeps between incremental runs. Run `flask
+analytics rebuild` once after upgrading to fill them from the history.
+
+Revision ID: a776d2d0f000
+Revises: a3c9e1f4b2d7
+Create Date: 2026-10-17 19:37:03.847604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a776d2d0f000'
+down_revision = 'a3c9e1f4b2d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('category_daily_stats',
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.Column('rating_1', sa.Integer(), nullable=False),
+    sa.Column('rating_2', sa.Integer(), nullable=False),
+    sa.Column('rating_3', sa.Integer(), nullable=False),
+    sa.Column('rating_4', sa.Integer(), nullable=False),
+    sa.Column('rating_5', sa.Integer(), nullable=False),
+    sa.Column('sentiment_sum', sa.Float(), nullable=False),
+    sa.Column('sentiment_count', sa.Integer(), nullable=False),
+    sa.Column('reviewer_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('category', 'day')
+    )
+    with op.batch_alter_table('category_daily_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_category_daily_stats_day', ['day'], unique=False)
+
+    op.create_table('rollup_state',
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.Column('last_review_id', sa.Integer(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('item_daily_stats',
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.Column('rating_1', sa.Integer(), nullable=False),
+    sa.Column('rating_2', sa.Integer(), nullable=False),
+    sa.Column('rating_3', sa.Integer(), nullable=False),
+    sa.Column('rating_4', sa.Integer(), nullable=False),
+    sa.Column('rating_5', sa.Integer(), nullable=False),
+    sa.Column('sentiment_sum', sa.Float(), nullable=False),
+    sa.Column('sentiment_count', sa.Integer(), nullable=False),
+    sa.Column('reviewer_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['item.id'], ),
+    sa.PrimaryKeyConstraint('item_id', 'day')
+    )
+    with op.batch_alter_table('item_daily_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_item_daily_stats_day', ['day'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('item_daily_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_item_daily_stats_day')
+
+    op.drop_table('item_daily_stats')
+    op.drop_table('rollup_state')
+    with op.batch_alter_table('category_daily_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_category_daily_stats_day')
+
+    op.drop_table('category_daily_stats')
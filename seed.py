@@ -1,7 +1,12 @@
 # seed.py
-from app import create_app, db, bcrypt
-from app.models import User, Item, Review
-from textblob import TextBlob
+import os
+# Score inline: a process pool would re-import this unguarded script
+os.environ.setdefault('TASKS_ASYNC', '0')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+
+from app import create_app, db, passwords, leaderboards, sentiment, recommendations, analytics
+from app.models import User, Item, Review, rebuild_item_aggregates
+from flask_migrate import stamp
 
 # Create an app context to interact with the database
 app = create_app()
@@ -10,9 +15,12 @@ with app.app_context():
     print("--> Dropping all tables and recreating...")
     db.drop_all()
     db.create_all()
+    # The tables match the latest migration; record that for `flask db upgrade`
+    stamp()
 
     # --- Create Users with Bios ---
-    hashed_pw_admin = bcrypt.generate_password_hash('password').decode('utf-8')
+    # Low-cost hashes keep seeding fast; login upgrades them to BCRYPT_LOG_ROUNDS
+    hashed_pw_admin = passwords.hash('password', rounds=4)
     admin_user = User(
         username='admin', 
         password=hashed_pw_admin, 
@@ -20,7 +28,7 @@ with app.app_context():
         bio='The original Canteen Crusader. Finding the best food on campus.'
     )
     
-    hashed_pw_user = bcrypt.generate_password_hash('1234').decode('utf-8')
+    hashed_pw_user = passwords.hash('1234', rounds=4)
     user_troy = User(
         username='Troy', 
         password=hashed_pw_user,
@@ -56,11 +64,14 @@ with app.app_context():
         {"rating": 2, "text": 'The cold coffee was terrible and watery.', "author": admin_user, "item": item3},
         {"rating": 3, "text": 'The biryani was just average.', "author": user_troy, "item": item4}
     ]
-    for review_data in reviews_to_add:
-        sentiment_score = TextBlob(review_data["text"]).sentiment.polarity
-        new_review = Review(rating=review_data["rating"], text=review_data["text"], author=review_data["author"], item=review_data["item"], sentiment=sentiment_score)
+    scores = sentiment.analyze_batch([review_data["text"] for review_data in reviews_to_add])
+    for review_data, sentiment_score in zip(reviews_to_add, scores):
+        new_review = Review(rating=review_data["rating"], text=review_data["text"], author=review_data["author"], item=review_data["item"], sentiment=sentiment_score, sentiment_version=sentiment.ANALYZER_VERSION)
         db.session.add(new_review)
     db.session.commit()
+    rebuild_item_aggregates()
+    leaderboards.rebuild()
+    analytics.rebuild()
     print("--> Sample reviews with sentiment added.")
 
     # --- Add Favorite Items ---
@@ -68,6 +79,7 @@ with app.app_context():
     user_troy.favorited_items.append(item2)
     admin_user.favorited_items.append(item4)
     db.session.commit()
-    print("--> Favorite items assigned.")
+    recommendations.rebuild()
+    print("--> Favorite items assigned and recommendations computed.")
 
     print("\n✅ Sample data has been successfully created!")